@@ -0,0 +1,56 @@
+import io
+import os
+import pstats
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from app.core.config import settings
+from app.core.profiling import SLOW_REQUESTS, ProfiledRoute, get_profile_dir
+from app.core.bandwidth import SCHEDULER
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/slow-requests")
+async def list_slow_requests(limit: int = Query(50, ge=1, le=200)):
+    """
+    Most recent requests slower than SLOW_REQUEST_MS, newest first, with stage timings.
+    """
+    return {
+        "threshold_ms": settings.SLOW_REQUEST_MS,
+        "requests": list(reversed(SLOW_REQUESTS))[:limit]
+    }
+
+
+@router.get("/bandwidth")
+async def bandwidth_utilisation():
+    """
+    Current file-stream throughput against the configured limits, per session and per stream.
+    Figures cover the worker process that answers the request.
+    """
+    return SCHEDULER.utilisation()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, raw: bool = Query(False), sort: str = Query("cumulative"), top: int = Query(40, ge=1, le=500)):
+    """
+    Return a captured cProfile run as a pstats text report, or the raw `.prof` file with `raw=true`.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profile_id.isalnum():
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+
+    prof_path = os.path.join(get_profile_dir(), f"{profile_id}.prof")
+    if not os.path.isfile(prof_path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if raw:
+        return FileResponse(prof_path, filename=f"{profile_id}.prof", media_type="application/octet-stream")
+
+    out = io.StringIO()
+    try:
+        stats = pstats.Stats(prof_path, stream=out)
+        stats.sort_stats(sort).print_stats(top)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    return PlainTextResponse(out.getvalue())
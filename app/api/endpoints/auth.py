@@ -1,13 +1,20 @@
-import time
+import uuid
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from app.core.config import settings
+from app.core.assets import register_template_globals
+from app.core.shared_state import SharedState
+from app.core.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 templates = Jinja2Templates(directory="templates")
+register_template_globals(templates)
 
-LOGIN_ATTEMPTS = {}
+# Failed PIN attempts per client IP, shared by all worker processes
+LOGIN_ATTEMPTS = "login_attempts"
+LOGIN_WINDOW_SECONDS = 60
+LOGIN_MAX_ATTEMPTS = 5
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -19,17 +26,12 @@ async def login_page(request: Request):
 
 
 @router.post("/login")
-async def login(request: Request, pin: str = Form(...)):
+def login(request: Request, pin: str = Form(...)):
     """Validate PIN and set session."""
     client_ip = request.client.host if request.client else "unknown"
-    now = time.time()
-    
-    global LOGIN_ATTEMPTS
-    # Cleanup attempts older than 60 seconds
-    LOGIN_ATTEMPTS = {ip: attempts for ip, attempts in LOGIN_ATTEMPTS.items() if now - attempts[-1] < 60}
-    
-    attempts = LOGIN_ATTEMPTS.get(client_ip, [])
-    if len(attempts) >= 5:
+
+    # Every attempt is counted before the PIN is checked; a correct PIN clears the count
+    if not SharedState.try_add_event(LOGIN_ATTEMPTS, client_ip, LOGIN_WINDOW_SECONDS, LOGIN_MAX_ATTEMPTS):
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "TOO MANY ATTEMPTS. PLEASE WAIT."},
@@ -38,12 +40,10 @@ async def login(request: Request, pin: str = Form(...)):
 
     if pin == settings.ACCESS_PIN:
         request.session["authenticated"] = True
-        if client_ip in LOGIN_ATTEMPTS:
-            del LOGIN_ATTEMPTS[client_ip]
+        # Identifies the session to the per-client bandwidth limit
+        request.session["sid"] = uuid.uuid4().hex
+        SharedState.clear_events(LOGIN_ATTEMPTS, client_ip)
         return RedirectResponse(url="/", status_code=302)
-        
-    attempts.append(now)
-    LOGIN_ATTEMPTS[client_ip] = attempts
 
     return templates.TemplateResponse(
         "login.html",
@@ -0,0 +1,94 @@
+import os
+from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from app.core.config import settings
+from app.core.profiling import ProfiledRoute
+from app.services.duplicates import DuplicateService
+from app.utils.security import validate_path
+
+router = APIRouter(route_class=ProfiledRoute)
+
+# Plain `def` endpoints run in FastAPI's threadpool: starting, polling and
+# cancelling a scan take file locks and query SQLite, which must not block the event loop
+
+
+@router.post("/scan")
+def start_duplicate_scan(path: str = Query(...), min_size: int = Query(64 * 1024, ge=1)):
+    """
+    Start a background duplicate scan of a folder (or return the one already running).
+    Poll /duplicates/jobs/{id} for progress, then read the groups from /duplicates.
+    """
+    try:
+        validate_path(path)
+        if not os.path.isdir(path):
+            raise HTTPException(status_code=404, detail="Folder not found")
+        return DuplicateService.start(path, min_size)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start scan: {str(e)}")
+
+
+@router.get("/jobs/{job_id}")
+def get_duplicate_job(job_id: str):
+    """
+    Progress of a duplicate scan: stage (scan/size/partial/full), files seen, candidates left and bytes hashed.
+    """
+    try:
+        return DuplicateService.get_job(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+@router.delete("/jobs/{job_id}")
+def cancel_duplicate_job(job_id: str):
+    """
+    Cancel a running duplicate scan.
+    """
+    try:
+        DuplicateService.cancel(job_id)
+        return {"detail": "Cancellation requested"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+@router.get("")
+def list_duplicates(path: str = Query(...)):
+    """
+    Duplicate groups from the last scan of a folder, largest reclaimable space first.
+    """
+    try:
+        validate_path(path)
+        return DuplicateService.results(path)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load duplicates: {str(e)}")
+
+
+@router.post("/trash")
+def trash_duplicates(path: str = Query(...), paths: List[str] = Query(...)):
+    """
+    Move selected duplicate copies to the Trash. At least one copy of each group is always kept.
+    """
+    if settings.READ_ONLY:
+        raise HTTPException(status_code=405, detail="Delete not allowed in Read-Only mode")
+
+    try:
+        validate_path(path)
+        for item in paths:
+            validate_path(item)
+        trashed = DuplicateService.trash_duplicates(path, paths)
+        return {"detail": f"{len(trashed)} item(s) moved to trash", "trashed": trashed}
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to trash duplicates: {str(e)}")
@@ -1,23 +1,60 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Body, HTTPException, Query, Request
 from typing import List, Dict, Any, Optional
-from app.services.drive import DriveService
+from app.services.drive import DriveService, SORT_KEYS
+from app.services.transcode import TranscodeService
+from app.services.thumbnails import ThumbnailService
+from app.services.images import ImageService
+from app.services.text_index import TextIndexService
+from app.services.prefetch import PrefetchService
+from urllib.parse import quote
 from app.core.config import settings
 import os
+import logging
 import platform
-from fastapi.responses import FileResponse, StreamingResponse
-from PIL import Image
-import io
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, PlainTextResponse
+import time
 from app.utils.security import validate_path
+from app.core.metrics import ARCHIVE_OPEN_SECONDS
+from app.core.bandwidth import PacedStreamingResponse, PacedFileResponse
+from app.core.profiling import ProfiledRoute, stage, record_stage
+from app.core.serialization import to_columns, encode_response
+from app.core.singleflight import SingleFlight
 from app.core.constants import IMAGE_EXTENSIONS, ARCHIVE_EXTENSIONS, VIDEO_EXTENSIONS
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+logger = logging.getLogger(__name__)
+
+# Column order for `format=compact` responses
+LIST_COLUMNS = ("name", "is_dir", "size", "modified", "meta")
+ARCHIVE_COLUMNS = ("name", "is_dir", "size", "compressed")
+TRASH_COLUMNS = ("id", "original_name", "original_path", "is_dir", "size", "deleted_at")
+
+# Duplicate concurrent requests (grid re-renders, retries, second tabs) share one computation
+_thumbnail_flight = SingleFlight("thumbnail")
+_archive_flight = SingleFlight("archive")
 
 @router.get("/list")
-async def list_files(path: Optional[str] = Query(None), skip: int = Query(0, ge=0), limit: int = Query(100, ge=1)):
+def list_files(
+    request: Request,
+    path: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    sort: str = Query("name"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    metadata: bool = Query(False),
+    mode: str = Query("full", pattern="^(full|names)$"),
+    format: str = Query("full", pattern="^(full|compact)$")
+):
     """
     List files in a directory. 
     If path is None, returns available drives (or root on Linux).
+    `sort`: name, size, modified, taken, duration or resolution.
+    `metadata=true` adds dimensions / date taken / duration to media files.
+    `mode=names` skips stat entirely (name, path, type only); see POST /hydrate.
+    `format=compact` returns columnar arrays of raw values (see app/core/serialization.py).
     """
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
     try:
         # If path is provided but empty string, treat is as None (root)
         if path == "":
@@ -27,7 +64,24 @@ async def list_files(path: Optional[str] = Query(None), skip: int = Query(0, ge=
         if path and path.endswith(":") and platform.system() == "Windows":
             path += "\\"
 
-        return DriveService.list_directory(path, skip=skip, limit=limit)
+        # Drive listings are tiny and carry nested stats, so they always use the full format
+        compact = format == "compact" and path is not None
+        result = DriveService.list_directory(path, skip=skip, limit=limit, sort=sort, order=order,
+                                             metadata=metadata, names_only=(mode == "names"), raw=compact)
+        try:
+            # Warm the next page's thumbnails and the visible subfolders in the background
+            PrefetchService.schedule(request, path, result, sort, order)
+        except Exception:
+            # Pre-warming is best effort and must never fail the listing
+            logger.warning("Prefetch scheduling for %s failed", path, exc_info=True)
+        with stage("serialize"):
+            if compact:
+                # The listing may be shared with coalesced requests: build a new payload
+                payload = {k: v for k, v in result.items() if k != "items"}
+                # Paths are rebuilt client-side as base + sep + name
+                payload.update(to_columns(result["items"], LIST_COLUMNS), base=path, sep=os.sep)
+                return encode_response(payload, request.headers.get("accept", ""))
+            return JSONResponse(content=result)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Path not found")
     except PermissionError:
@@ -38,8 +92,28 @@ async def list_files(path: Optional[str] = Query(None), skip: int = Query(0, ge=
         # Log the exception here in a real app
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
+@router.post("/prefetch/cancel")
+def cancel_prefetch(request: Request):
+    """
+    Stop this session's background pre-warming (sent by the page when it is closed).
+    """
+    PrefetchService.cancel(request)
+    return {"status": "cancelled"}
+
+@router.post("/hydrate")
+def hydrate_files(paths: List[str] = Body(..., embed=True, max_length=500), metadata: bool = Body(False, embed=True)):
+    """
+    Size, mtime, mime type (and optionally media metadata) for a batch of paths,
+    stat'ed concurrently. Used to fill in rows of a `mode=names` listing as they scroll into view.
+    """
+    try:
+        with stage("serialize"):
+            return JSONResponse(content={"items": DriveService.hydrate(paths, metadata=metadata)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to hydrate: {str(e)}")
+
 @router.get("/view")
-async def view_file(path: str = Query(...)):
+async def view_file(request: Request, path: str = Query(...)):
     """
     Stream a file for viewing (e.g., images, videos, PDFs).
     """
@@ -56,8 +130,10 @@ async def view_file(path: str = Query(...)):
                 while chunk := f.read(65536):
                     yield chunk
                     
-        return StreamingResponse(
+        return PacedStreamingResponse(
             file_iterator(), 
+            request=request,
+            path=path,
             media_type=content_type,
             headers={"Cache-Control": "public, max-age=3600"}  # Cache 1 hour
         )
@@ -66,8 +142,35 @@ async def view_file(path: str = Query(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
+@router.get("/preview")
+def preview_image(request: Request, path: str = Query(...), width: int = Query(1920, ge=64, le=8192)):
+    """
+    Screen-sized WebP/JPEG rendition of a large image for the viewer.
+    Small images are returned unchanged; /view always serves the original.
+    """
+    import mimetypes as mt
+    try:
+        validate_path(path)
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="File not found")
+        if path.split('.')[-1].lower() not in IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail="Not a supported image type")
+
+        fmt = ImageService.negotiate_format(request.headers.get("accept", ""))
+        cache_file, media_type = ImageService.preview(path, width, fmt)
+        headers = {"Cache-Control": "public, max-age=86400", "Vary": "Accept"}
+        if cache_file is None:
+            return FileResponse(path, media_type=mt.guess_type(path)[0] or "application/octet-stream", headers=headers)
+        return FileResponse(cache_file, media_type=media_type, headers=headers)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to render preview: {str(e)}")
+
 @router.get("/download")
-async def download_file(path: str = Query(...)):
+async def download_file(request: Request, path: str = Query(...)):
     """
     Download a file as an attachment.
     """
@@ -76,8 +179,11 @@ async def download_file(path: str = Query(...)):
         if not os.path.isfile(path):
             raise HTTPException(status_code=404, detail="File not found")
         stat = os.stat(path)
-        return FileResponse(
+        # Downloads are always bulk so they never crowd out browsing
+        return PacedFileResponse(
             path,
+            request=request,
+            bulk=True,
             filename=os.path.basename(path),
             stat_result=stat
         )
@@ -86,10 +192,111 @@ async def download_file(path: str = Query(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
+def _validate_video(path: str) -> None:
+    validate_path(path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if path.split('.')[-1].lower() not in VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Not a supported video type")
+
+# The streaming endpoints below are plain `def` so FastAPI runs them in its
+# threadpool: ffprobe/ffmpeg can take seconds and must not block the event loop.
+
+@router.get("/stream/info")
+def stream_info(path: str = Query(...)):
+    """
+    Describe how a video should be played: direct, remux or transcode.
+    """
+    try:
+        _validate_video(path)
+        return TranscodeService.playback_plan(path)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to probe video: {str(e)}")
+
+@router.get("/stream/keyframe")
+def stream_keyframe(path: str = Query(...), time: float = Query(..., ge=0)):
+    """
+    The keyframe at or before `time`, where a remuxed /stream/fmp4 started at `time` begins.
+    """
+    try:
+        _validate_video(path)
+        return {"time": TranscodeService.keyframe_before(path, time)}
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to find keyframe: {str(e)}")
+
+@router.get("/stream/playlist.m3u8")
+def stream_playlist(path: str = Query(...)):
+    """
+    HLS playlist for a video; segments are generated on demand.
+    """
+    try:
+        _validate_video(path)
+        return PlainTextResponse(
+            TranscodeService.playlist(path),
+            media_type="application/vnd.apple.mpegurl",
+            headers={"Cache-Control": "private, max-age=3600"}
+        )
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build playlist: {str(e)}")
+
+@router.get("/stream/segment")
+def stream_segment(path: str = Query(...), index: int = Query(..., ge=0)):
+    """
+    A single MPEG-TS segment of the HLS rendition.
+    """
+    try:
+        _validate_video(path)
+        seg_path = TranscodeService.segment(path, index)
+        return FileResponse(seg_path, media_type="video/mp2t", headers={"Cache-Control": "private, max-age=86400"})
+    except IndexError:
+        raise HTTPException(status_code=404, detail="Segment out of range")
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate segment: {str(e)}")
+
+@router.get("/stream/fmp4")
+def stream_fmp4(path: str = Query(...), start: float = Query(0.0, ge=0)):
+    """
+    Fragmented MP4 stream (remuxed or transcoded) for browsers without native HLS.
+    """
+    try:
+        _validate_video(path)
+        # Probe up front so errors surface as HTTP errors, not a truncated stream
+        TranscodeService.playback_plan(path)
+        return StreamingResponse(TranscodeService.stream_fmp4(path, start), media_type="video/mp4")
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to stream video: {str(e)}")
+
 @router.get("/thumbnail")
-async def get_thumbnail(path: str = Query(...)):
+def get_thumbnail(
+    request: Request,
+    path: str = Query(...),
+    size: int = Query(128, ge=16, le=512),
+    scale: int = Query(1, ge=1, le=2)
+):
     """
     Generate a thumbnail for an image or video file.
+    `size` is snapped up to a preset (128/256/512); `scale=2` renders the HiDPI variant.
+    The format (AVIF/WebP/JPEG) follows the Accept header.
     """
     try:
         validate_path(path)
@@ -101,48 +308,23 @@ async def get_thumbnail(path: str = Query(...)):
         if ext not in IMAGE_EXTENSIONS and ext not in VIDEO_EXTENSIONS:
              raise HTTPException(status_code=400, detail="Not a supported media type")
 
-        img = None
-        # Handle Videos via FFmpeg
-        if ext in VIDEO_EXTENSIONS:
-            import subprocess
-            cmd = [
-                "ffmpeg", 
-                "-y", 
-                "-i", path, 
-                "-vframes", "1", 
-                "-f", "image2pipe", 
-                "-vcodec", "mjpeg", 
-                "-"
-            ]
-            try:
-                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=5)
-                if result.returncode != 0:
-                     raise HTTPException(status_code=500, detail="Failed to read video frame")
-                img = Image.open(io.BytesIO(result.stdout))
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
-        else:
-            # Handle standard Images
-            img = Image.open(path)
-            
+        fmt = ImageService.negotiate_format(request.headers.get("accept", ""), allow_avif=True)
         try:
-            # Generate Thumbnail
-            img.thumbnail((100, 100))
-            
-            buf = io.BytesIO()
-            format = img.format or "JPEG"
-            img.save(buf, format=format)
-            buf.seek(0)
-            
-            return StreamingResponse(
-                buf,
-                media_type=f"image/{format.lower()}",
-                headers={"Cache-Control": "public, max-age=86400"}  # Cache 1 day
+            pixels = ImageService.snap_thumbnail_size(size) * scale
+            cache_file, media_type = _thumbnail_flight.do(
+                (path, pixels, fmt), ImageService.thumbnail, path, size, scale, fmt
             )
+            PrefetchService.note_thumbnail(request, size, scale, fmt)
         except Exception as e:
             print(f"Thumbnail generation failed: {e}")
             raise HTTPException(status_code=500, detail="Failed to generate thumbnail")
 
+        return FileResponse(
+            cache_file,
+            media_type=media_type,
+            headers={"Cache-Control": "public, max-age=86400", "Vary": "Accept"}  # Cache 1 day
+        )
+
     except PermissionError:
         raise HTTPException(status_code=403, detail="Permission denied")
     except Exception as e:
@@ -150,124 +332,245 @@ async def get_thumbnail(path: str = Query(...)):
              raise e
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sprite_url(path: str, frames: int) -> str:
+    return f"/api/files/thumbnail/sprite?path={quote(path, safe='')}&frames={frames}"
 
-@router.get("/archive")
-async def list_archive(path: str = Query(...), password: Optional[str] = Query(None)):
+@router.get("/thumbnail/sprite")
+def get_video_sprite(path: str = Query(...), frames: int = Query(settings.VIDEO_SPRITE_FRAMES, ge=2, le=60)):
     """
-    List the contents of an archive file (zip, tar, gz, bz2, 7z, rar).
+    A horizontal strip of evenly spaced frames for hover-scrubbing, rendered once and cached.
     """
     try:
-        validate_path(path)
+        _validate_video(path)
+        sprite_path, _ = ThumbnailService.sprite(path, frames)
+        return FileResponse(sprite_path, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=86400"})
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate sprite: {str(e)}")
 
-        if not os.path.isfile(path):
-            raise HTTPException(status_code=404, detail="File not found")
+@router.get("/thumbnail/sprite/map")
+def get_video_sprite_map(path: str = Query(...), frames: int = Query(settings.VIDEO_SPRITE_FRAMES, ge=2, le=60)):
+    """
+    Timing map for the sprite strip: tile size and the timestamp of each frame.
+    """
+    try:
+        _validate_video(path)
+        _, timing = ThumbnailService.sprite(path, frames)
+        return {**timing, "url": _sprite_url(path, frames)}
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate sprite: {str(e)}")
 
-        ext = path.split('.')[-1].lower()
-        basename = os.path.basename(path).lower()
+@router.get("/thumbnail/sprite.vtt")
+def get_video_sprite_vtt(path: str = Query(...), frames: int = Query(settings.VIDEO_SPRITE_FRAMES, ge=2, le=60)):
+    """
+    WebVTT thumbnail track over the sprite strip, for Plyr's seek-bar previews.
+    """
+    try:
+        _validate_video(path)
+        _, timing = ThumbnailService.sprite(path, frames)
+        return PlainTextResponse(ThumbnailService.sprite_vtt(timing, _sprite_url(path, frames)), media_type="text/vtt")
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate sprite: {str(e)}")
 
-        entries = []
+def _validate_text(path: str) -> None:
+    validate_path(path)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
 
-        if ext == 'zip':
-            import zipfile
-            if not zipfile.is_zipfile(path):
-                raise HTTPException(status_code=400, detail="Not a valid zip file")
+@router.get("/text/lines")
+def get_text_lines(path: str = Query(...), start: int = Query(0, ge=0), count: int = Query(200, ge=1, le=5000)):
+    """
+    A range of lines from a text file of any size, served from a cached line index.
+    """
+    try:
+        _validate_text(path)
+        return JSONResponse(TextIndexService.read_lines(path, start, count))
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read lines: {str(e)}")
+
+@router.get("/text/tail")
+async def tail_text(request: Request, path: str = Query(...), offset: int = Query(..., ge=0), line: int = Query(..., ge=0)):
+    """
+    Follow a growing file: Server-Sent Events with each line appended after `offset`.
+    Use `tail_offset`/`tail_line` from /text/lines as the starting point.
+    """
+    try:
+        _validate_text(path)
+        return StreamingResponse(
+            TextIndexService.follow(path, offset, line, request.is_disconnected),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to follow file: {str(e)}")
+
+
+def _read_archive(path: str, password: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Parse the entry list of an archive, directories first. Raises HTTPException
+    for bad/unsupported archives and `password_required`.
+    """
+    ext = path.split('.')[-1].lower()
+    basename = os.path.basename(path).lower()
+
+    entries = []
+    started = time.perf_counter()
+
+    if ext == 'zip':
+        import zipfile
+        if not zipfile.is_zipfile(path):
+            raise HTTPException(status_code=400, detail="Not a valid zip file")
+        try:
+            pwd_bytes = password.encode('utf-8') if password else None
+            with zipfile.ZipFile(path, 'r') as zf:
+                for info in zf.infolist():
+                    # Try to read a tiny bit of the first file to properly trigger password exceptions
+                    if not info.is_dir() and info.flag_bits & 0x1:
+                        if not pwd_bytes:
+                            raise RuntimeError("Bad password")
+                    entries.append({
+                        "name": info.filename,
+                        "size": info.file_size,
+                        "compressed": info.compress_size,
+                        "is_dir": info.is_dir(),
+                    })
+        except RuntimeError as e:
+            if 'Bad password' in str(e) or 'password required' in str(e).lower():
+                raise HTTPException(status_code=401, detail="password_required")
+            raise HTTPException(status_code=500, detail=f"Zip error: {e}")
+
+    elif basename.endswith('.tar.gz') or basename.endswith('.tar.bz2') or ext in ('tar', 'gz', 'bz2'):
+        import tarfile
+        try:
+            with tarfile.open(path, 'r:*') as tf:
+                for member in tf.getmembers():
+                    entries.append({
+                        "name": member.name,
+                        "size": member.size,
+                        "compressed": member.size,
+                        "is_dir": member.isdir(),
+                    })
+        except tarfile.TarError:
+            raise HTTPException(status_code=400, detail="Not a valid tar archive")
+
+    elif ext == '7z':
+        try:
+            import py7zr
             try:
-                pwd_bytes = password.encode('utf-8') if password else None
-                with zipfile.ZipFile(path, 'r') as zf:
-                    for info in zf.infolist():
-                        # Try to read a tiny bit of the first file to properly trigger password exceptions
-                        if not info.is_dir() and info.flag_bits & 0x1:
-                            if not pwd_bytes:
-                                raise RuntimeError("Bad password")
+                with py7zr.SevenZipFile(path, mode='r', password=password) as z:
+                    if z.needs_password() and not password:
+                        raise py7zr.exceptions.PasswordRequired()
+                    for info in z.list():
                         entries.append({
                             "name": info.filename,
-                            "size": info.file_size,
-                            "compressed": info.compress_size,
-                            "is_dir": info.is_dir(),
+                            "size": info.uncompressed,
+                            "compressed": info.uncompressed, # 7z doesn't easily expose individual compressed sizes in list()
+                            "is_dir": info.is_directory,
                         })
-            except RuntimeError as e:
-                if 'Bad password' in str(e) or 'password required' in str(e).lower():
+            except (py7zr.exceptions.PasswordRequired, py7zr.exceptions.Bad7zFile):
+                raise HTTPException(status_code=401, detail="password_required")
+            except Exception as e:
+                if 'Corrupt' in str(e) or 'LZMAError' in str(type(e)):
                     raise HTTPException(status_code=401, detail="password_required")
-                raise HTTPException(status_code=500, detail=f"Zip error: {e}")
+                raise e
+        except ImportError:
+            raise HTTPException(status_code=400, detail="7z format requires py7zr library (not installed)")
 
-        elif basename.endswith('.tar.gz') or basename.endswith('.tar.bz2') or ext in ('tar', 'gz', 'bz2'):
-            import tarfile
+    elif ext == 'rar':
+        try:
+            import rarfile
+            rarfile.UNRAR_TOOL = "bsdtar"
             try:
-                with tarfile.open(path, 'r:*') as tf:
-                    for member in tf.getmembers():
+                with rarfile.RarFile(path, 'r') as rf:
+                    if rf.needs_password():
+                        if not password:
+                            raise rarfile.PasswordRequired()
+                        rf.setpassword(password)
+                    for info in rf.infolist():
                         entries.append({
-                            "name": member.name,
-                            "size": member.size,
-                            "compressed": member.size,
-                            "is_dir": member.isdir(),
+                            "name": info.filename,
+                            "size": info.file_size,
+                            "compressed": info.compress_size,
+                            "is_dir": info.isdir(),
                         })
-            except tarfile.TarError:
-                raise HTTPException(status_code=400, detail="Not a valid tar archive")
-
-        elif ext == '7z':
-            try:
-                import py7zr
-                try:
-                    with py7zr.SevenZipFile(path, mode='r', password=password) as z:
-                        if z.needs_password() and not password:
-                            raise py7zr.exceptions.PasswordRequired()
-                        for info in z.list():
-                            entries.append({
-                                "name": info.filename,
-                                "size": info.uncompressed,
-                                "compressed": info.uncompressed, # 7z doesn't easily expose individual compressed sizes in list()
-                                "is_dir": info.is_directory,
-                            })
-                except (py7zr.exceptions.PasswordRequired, py7zr.exceptions.Bad7zFile):
-                    raise HTTPException(status_code=401, detail="password_required")
-                except Exception as e:
-                    if 'Corrupt' in str(e) or 'LZMAError' in str(type(e)):
-                        raise HTTPException(status_code=401, detail="password_required")
-                    raise e
-            except ImportError:
-                raise HTTPException(status_code=400, detail="7z format requires py7zr library (not installed)")
+            except rarfile.PasswordRequired:
+                raise HTTPException(status_code=401, detail="password_required")
+            except rarfile.BadRarFile:
+                 raise HTTPException(status_code=401, detail="password_required") # Sometimes bad password surfaces as BadRarFile
+        except ImportError:
+            raise HTTPException(status_code=400, detail="RAR format requires rarfile library (not installed)")
 
-        elif ext == 'rar':
-            try:
-                import rarfile
-                rarfile.UNRAR_TOOL = "bsdtar"
-                try:
-                    with rarfile.RarFile(path, 'r') as rf:
-                        if rf.needs_password():
-                            if not password:
-                                raise rarfile.PasswordRequired()
-                            rf.setpassword(password)
-                        for info in rf.infolist():
-                            entries.append({
-                                "name": info.filename,
-                                "size": info.file_size,
-                                "compressed": info.compress_size,
-                                "is_dir": info.isdir(),
-                            })
-                except rarfile.PasswordRequired:
-                    raise HTTPException(status_code=401, detail="password_required")
-                except rarfile.BadRarFile:
-                     raise HTTPException(status_code=401, detail="password_required") # Sometimes bad password surfaces as BadRarFile
-            except ImportError:
-                raise HTTPException(status_code=400, detail="RAR format requires rarfile library (not installed)")
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported archive format")
 
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported archive format")
+    opened_in = time.perf_counter() - started
+    ARCHIVE_OPEN_SECONDS.observe(opened_in, format='tar' if ext in ('gz', 'bz2') else ext)
+    record_stage("open", opened_in)
 
-        # Sort: directories first, then files, both alphabetical
+    # Sort: directories first, then files, both alphabetical
+    with stage("sort"):
         entries.sort(key=lambda x: (not x["is_dir"], x["name"].lower()))
+    return entries
 
-        from app.utils.formatters import format_size
-        for entry in entries:
-            entry["size_fmt"] = format_size(entry["size"]) if not entry["is_dir"] else "-"
-            entry["compressed_fmt"] = format_size(entry["compressed"]) if not entry["is_dir"] else "-"
 
-        return {
+@router.get("/archive")
+def list_archive(
+    request: Request,
+    path: str = Query(...),
+    password: Optional[str] = Query(None),
+    format: str = Query("full", pattern="^(full|compact)$")
+):
+    """
+    List the contents of an archive file (zip, tar, gz, bz2, 7z, rar).
+    `format=compact` returns columnar arrays without the formatted size fields.
+    """
+    try:
+        validate_path(path)
+
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="File not found")
+
+        entries = _archive_flight.do((path, password), _read_archive, path, password)
+
+        summary = {
             "filename": os.path.basename(path),
             "total_files": sum(1 for e in entries if not e["is_dir"]),
             "total_dirs": sum(1 for e in entries if e["is_dir"]),
-            "entries": entries
         }
+        if format == "compact":
+            with stage("serialize"):
+                summary.update(to_columns(entries, ARCHIVE_COLUMNS))
+                return encode_response(summary, request.headers.get("accept", ""))
+
+        from app.utils.formatters import format_size
+        # Entries may be shared with coalesced requests, so format into copies
+        entries = [{
+            **entry,
+            "size_fmt": format_size(entry["size"]) if not entry["is_dir"] else "-",
+            "compressed_fmt": format_size(entry["compressed"]) if not entry["is_dir"] else "-",
+        } for entry in entries]
+
+        with stage("serialize"):
+            return JSONResponse(content={**summary, "entries": entries})
 
     except PermissionError:
         raise HTTPException(status_code=403, detail="Permission denied")
@@ -278,7 +581,7 @@ async def list_archive(path: str = Query(...), password: Optional[str] = Query(N
 
 
 @router.get("/archive/view")
-async def view_archive_entry(path: str = Query(...), entry: str = Query(...), password: Optional[str] = Query(None)):
+async def view_archive_entry(request: Request, path: str = Query(...), entry: str = Query(...), password: Optional[str] = Query(None)):
     """
     Extract and stream a single file from inside an archive (zip, tar, 7z, rar).
     Used for previewing images/videos within archives.
@@ -390,7 +693,7 @@ async def view_archive_entry(path: str = Query(...), entry: str = Query(...), pa
             except rarfile.BadRarFile:
                 raise HTTPException(status_code=401, detail="password_required")
 
-        return StreamingResponse(stream_archive(), media_type=content_type)
+        return PacedStreamingResponse(stream_archive(), request=request, path=f"{path}!{entry}", media_type=content_type)
 
     except PermissionError:
         raise HTTPException(status_code=403, detail="Permission denied")
@@ -514,11 +817,15 @@ async def delete_file(path: str = Query(...)):
         raise HTTPException(status_code=500, detail=f"Failed to delete item: {str(e)}")
 
 @router.get("/trash", response_model=List[Dict[str, Any]])
-async def list_trash():
+async def list_trash(request: Request, format: str = Query("full", pattern="^(full|compact)$")):
     """
     List all items currently in the Trash.
+    `format=compact` returns columnar arrays with raw sizes and epoch timestamps.
     """
     try:
+        if format == "compact":
+            items = DriveService.list_trash(raw=True)
+            return encode_response(to_columns(items, TRASH_COLUMNS), request.headers.get("accept", ""))
         return DriveService.list_trash()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list trash: {str(e)}")
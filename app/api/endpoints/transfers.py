@@ -0,0 +1,83 @@
+from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from app.core.config import settings
+from app.core.profiling import ProfiledRoute
+from app.services.transfers import TransferService, CONFLICT_POLICIES
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.post("")
+def start_transfer(
+    dest: str = Query(...),
+    paths: List[str] = Query(...),
+    op: str = Query("copy", pattern="^(copy|move)$"),
+    conflict: str = Query("rename")
+):
+    """
+    Copy or move files/folders into `dest` as a background job.
+    `conflict` decides what happens to existing targets: skip, overwrite or rename (name_1.ext).
+    Poll /transfers/{id} for progress.
+    """
+    if settings.READ_ONLY:
+        raise HTTPException(status_code=405, detail="Copy/move not allowed in Read-Only mode")
+    if conflict not in CONFLICT_POLICIES:
+        raise HTTPException(status_code=400, detail=f"Unknown conflict policy: {conflict}")
+
+    try:
+        return TransferService.start(op, paths, dest, conflict)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except NotADirectoryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start transfer: {str(e)}")
+
+
+@router.get("")
+def list_transfers():
+    """
+    Running and recently finished copy/move jobs, newest first.
+    """
+    return TransferService.list_jobs()
+
+
+@router.get("/{job_id}")
+def get_transfer(job_id: str):
+    """
+    Progress of a copy/move job: files and bytes done/total, skipped and failed files.
+    """
+    try:
+        return TransferService.get_job(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+@router.post("/{job_id}/{action}")
+def control_transfer(job_id: str, action: str):
+    """
+    Pause or resume a copy/move job.
+    """
+    if action not in ("pause", "resume"):
+        raise HTTPException(status_code=404, detail="Unknown action")
+    try:
+        TransferService.control(job_id, action)
+        return {"detail": f"{action.capitalize()} requested"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+@router.delete("/{job_id}")
+def cancel_transfer(job_id: str):
+    """
+    Cancel a copy/move job. Files already completed stay where they are.
+    """
+    try:
+        TransferService.control(job_id, "cancel")
+        return {"detail": "Cancellation requested"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
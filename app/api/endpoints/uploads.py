@@ -0,0 +1,98 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from app.core.config import settings
+from app.core.profiling import ProfiledRoute
+from app.services.uploads import UploadService, UploadError, DEFAULT_CHUNK_SIZE
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _check_writable() -> None:
+    if settings.READ_ONLY:
+        raise HTTPException(status_code=405, detail="Upload not allowed in Read-Only mode")
+
+
+@router.post("")
+def create_upload(
+    dest: str = Query(...),
+    name: str = Query(...),
+    size: int = Query(..., ge=0),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1),
+    overwrite: bool = Query(False)
+):
+    """
+    Start a resumable upload of `size` bytes into `dest/name`.
+    Send the chunks with PUT /uploads/{id}/chunks/{index} (any order, in parallel),
+    then POST /uploads/{id}/complete. Without `overwrite` an existing file is kept
+    and the upload is saved as name_1.ext.
+    """
+    _check_writable()
+    try:
+        return UploadService.create(dest, name, size, chunk_size, overwrite)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    except NotADirectoryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        if e.errno == 28:
+            raise HTTPException(status_code=507, detail="Not enough free space for this upload")
+        raise HTTPException(status_code=500, detail=f"Failed to start upload: {str(e)}")
+
+
+@router.get("/{upload_id}")
+def get_upload(upload_id: str):
+    """
+    Upload status, including the chunk indexes still missing (resume by sending only those).
+    """
+    try:
+        return UploadService.status(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+
+@router.put("/{upload_id}/chunks/{index}")
+async def put_upload_chunk(upload_id: str, index: int, request: Request):
+    """
+    Write one chunk (raw request body). Every chunk is `chunk_size` bytes except the last.
+    Re-sending a chunk simply overwrites it.
+    """
+    _check_writable()
+    try:
+        written = await UploadService.write_chunk(upload_id, index, request.stream())
+        return {"index": index, "received": written}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to write chunk: {str(e)}")
+
+
+@router.post("/{upload_id}/complete")
+def complete_upload(upload_id: str, sha256: Optional[str] = Query(None, pattern="^[0-9a-fA-F]{64}$")):
+    """
+    Finish an upload: check every chunk arrived (and the SHA-256 if given), then move the file into place.
+    """
+    _check_writable()
+    try:
+        return UploadService.complete(upload_id, sha256)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to complete upload: {str(e)}")
+
+
+@router.delete("/{upload_id}")
+def abort_upload(upload_id: str):
+    """
+    Abandon an upload and delete its partial data.
+    """
+    try:
+        UploadService.abort(upload_id)
+        return {"detail": "Upload aborted"}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload not found")
@@ -1,5 +1,10 @@
 from fastapi import APIRouter
-from app.api.endpoints import files
+from app.api.endpoints import files, admin, duplicates, transfers, uploads
+from app.core.profiling import ProfiledRoute
 
-api_router = APIRouter()
+api_router = APIRouter(route_class=ProfiledRoute)
 api_router.include_router(files.router, prefix="/files", tags=["files"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
+api_router.include_router(duplicates.router, prefix="/duplicates", tags=["duplicates"])
+api_router.include_router(transfers.router, prefix="/transfers", tags=["transfers"])
+api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
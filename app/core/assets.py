@@ -0,0 +1,101 @@
+"""
+Runtime side of the static asset pipeline (see app/utils/build_assets.py).
+
+Templates call `asset("js/main.js")` to get the hashed URL when a build
+manifest exists, falling back to the plain `/static/...` path in
+development. Hashed files are served with `Cache-Control: immutable`
+and, when the client accepts it, from their precompressed `.br`/`.gz`
+siblings.
+"""
+import json
+import mimetypes
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from markupsafe import Markup
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from app.core.compression import parse_accept_encoding
+
+STATIC_DIR = Path(__file__).resolve().parent.parent.parent / "static"
+MANIFEST_PATH = STATIC_DIR / "dist" / "manifest.json"
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Unhashed files are revalidated against their ETag on every load
+REVALIDATE_CACHE = "no-cache"
+
+PRECOMPRESSED_VARIANTS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@lru_cache(maxsize=1)
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def asset_url(path: str) -> str:
+    """URL for a static asset, content-hashed when the build manifest has it."""
+    return "/static/" + load_manifest().get(path, path)
+
+
+def import_map() -> Markup:
+    """`<script type="importmap">` mapping logical module URLs to hashed files (empty in development)."""
+    manifest = load_manifest()
+    imports = {
+        f"/static/{logical}": f"/static/{hashed}"
+        for logical, hashed in manifest.items()
+        if logical.endswith(".js")
+    }
+    if not imports:
+        return Markup("")
+    payload = json.dumps({"imports": imports}, sort_keys=True).replace("</", "<\\/")
+    return Markup(f'<script type="importmap">{payload}</script>')
+
+
+def register_template_globals(templates) -> None:
+    templates.env.globals["asset"] = asset_url
+    templates.env.globals["import_map"] = import_map
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers precompressed variants and marks hashed files immutable."""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        is_hashed = os.path.relpath(full_path, STATIC_DIR).replace(os.sep, "/").startswith("dist/")
+        headers = {"Cache-Control": IMMUTABLE_CACHE if is_hashed else REVALIDATE_CACHE}
+
+        response = None
+        if is_hashed:
+            headers["Vary"] = "Accept-Encoding"
+            if "range" not in request_headers:
+                accepted = parse_accept_encoding(request_headers.get("accept-encoding", ""))
+                for encoding, suffix in PRECOMPRESSED_VARIANTS:
+                    if accepted.get(encoding, 0) <= 0:
+                        continue
+                    try:
+                        variant_stat = os.stat(full_path + suffix)
+                    except FileNotFoundError:
+                        continue
+                    media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+                    response = FileResponse(
+                        full_path + suffix,
+                        status_code=status_code,
+                        stat_result=variant_stat,
+                        media_type=media_type,
+                        headers={**headers, "Content-Encoding": encoding},
+                    )
+                    break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
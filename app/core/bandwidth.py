@@ -0,0 +1,258 @@
+"""
+Bandwidth scheduling for file streams (/view, /download, /archive/view).
+
+Every response body chunk is paced through token buckets before it is sent:
+one per client session and one global. Streams are classed as interactive
+(images, documents, the start of anything) or bulk (downloads, and any stream
+past INTERACTIVE_BYTES, e.g. a long video). While interactive requests are in
+flight (interactive streams, plus short API requests such as listings and
+thumbnails, counted by InteractiveRequestMiddleware), bulk streams together may
+only use BANDWIDTH_BULK_SHARE of the global limit, so a 20 GB download can't
+starve the grid. Long-lived requests (video segments, log tails, upload chunks)
+never count as interactive.
+
+Buckets allow a short burst and then go into debt: the chunk is sent after
+sleeping off the debt. All state is touched from the event loop only, so no
+locks are needed. Limits apply per worker process.
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, StreamingResponse
+
+from app.core.config import settings
+from app.core.metrics import BANDWIDTH_BYTES, BANDWIDTH_WAIT_SECONDS
+
+MB = 1024 * 1024
+# Streams count as interactive until they have sent this much
+INTERACTIVE_BYTES = 2 * MB
+# Seconds of traffic a bucket may send at once after being idle
+BURST_SECONDS = 0.25
+# Window over which current throughput is measured for the admin view
+RATE_WINDOW = 2.0
+# Requests that never count as interactive: paced streams (classed by SCHEDULER
+# itself), video segments, the log tail event stream and uploads
+NON_INTERACTIVE_PATHS = (
+    "/api/files/view",
+    "/api/files/download",
+    "/api/files/archive/view",
+    "/api/files/stream/segment",
+    "/api/files/stream/fmp4",
+    "/api/files/text/tail",
+    "/api/uploads",
+)
+
+
+class _Bucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate * BURST_SECONDS
+        self.last = time.monotonic()
+
+    def delay(self, amount: int) -> float:
+        """Take `amount` tokens and return how long to wait before using them (0 = unlimited)."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class _Meter:
+    """Bytes per second over the last RATE_WINDOW seconds."""
+
+    def __init__(self):
+        self.total = 0
+        self.rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+
+    def add(self, amount: int) -> None:
+        self.total += amount
+        self._window_bytes += amount
+        self.current()
+
+    def current(self) -> float:
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= RATE_WINDOW:
+            self.rate = self._window_bytes / elapsed
+            self._window_start = now
+            self._window_bytes = 0
+        return self.rate
+
+
+class _Client:
+    def __init__(self, key: str, label: str):
+        self.key = key
+        self.label = label
+        self.bucket = _Bucket(settings.BANDWIDTH_CLIENT_MB_PER_SEC * MB)
+        self.meter = _Meter()
+        self.streams = 0
+
+
+class _Stream:
+    def __init__(self, client: _Client, path: str, bulk: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.client = client
+        self.path = path
+        self.always_bulk = bulk
+        self.sent = 0
+        self.started = time.time()
+
+    @property
+    def bulk(self) -> bool:
+        return self.always_bulk or self.sent >= INTERACTIVE_BYTES
+
+
+class BandwidthScheduler:
+    def __init__(self):
+        self.global_bucket = _Bucket(settings.BANDWIDTH_GLOBAL_MB_PER_SEC * MB)
+        self.bulk_bucket = _Bucket(settings.BANDWIDTH_GLOBAL_MB_PER_SEC * MB)
+        self.meter = _Meter()
+        self.clients: Dict[str, _Client] = {}
+        self.streams: Dict[str, _Stream] = {}
+        # Short, unpaced requests in flight (see InteractiveRequestMiddleware)
+        self.interactive_requests = 0
+
+    @staticmethod
+    def client_key(request: Request):
+        """Session id set at login, falling back to the client address for older sessions."""
+        host = request.client.host if request.client else "unknown"
+        sid = request.session.get("sid") if "session" in request.scope else None
+        return (sid or host), (f"{host} ({sid[:8]})" if sid else host)
+
+    def open(self, request: Request, path: str, bulk: bool) -> _Stream:
+        key, label = self.client_key(request)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = _Client(key, label)
+        client.streams += 1
+        stream = _Stream(client, path, bulk)
+        self.streams[stream.id] = stream
+        return stream
+
+    def close(self, stream: _Stream) -> None:
+        self.streams.pop(stream.id, None)
+        stream.client.streams -= 1
+        if stream.client.streams == 0:
+            self.clients.pop(stream.client.key, None)
+
+    def interactive_busy(self) -> bool:
+        """
+        True while any interactive stream or short API request is in flight.
+        Also polled from background threads, so it only reads a snapshot of the streams.
+        """
+        if self.interactive_requests > 0:
+            return True
+        return any(not s.bulk for s in list(self.streams.values()))
+
+    async def pace(self, stream: _Stream, amount: int) -> None:
+        kind = "bulk" if stream.bulk else "interactive"
+        wait = max(stream.client.bucket.delay(amount), self.global_bucket.delay(amount))
+        if stream.bulk:
+            share = settings.BANDWIDTH_BULK_SHARE if self.interactive_busy() else 1.0
+            self.bulk_bucket.rate = settings.BANDWIDTH_GLOBAL_MB_PER_SEC * MB * share
+            wait = max(wait, self.bulk_bucket.delay(amount))
+        if wait > 0:
+            BANDWIDTH_WAIT_SECONDS.inc(wait, kind=kind)
+            await asyncio.sleep(wait)
+        stream.sent += amount
+        stream.client.meter.add(amount)
+        self.meter.add(amount)
+        BANDWIDTH_BYTES.inc(amount, kind=kind)
+
+    def utilisation(self) -> Dict:
+        limit = settings.BANDWIDTH_GLOBAL_MB_PER_SEC * MB
+        rate = self.meter.current()
+        return {
+            "limits": {
+                "global_bytes_per_sec": limit or None,
+                "client_bytes_per_sec": settings.BANDWIDTH_CLIENT_MB_PER_SEC * MB or None,
+                "bulk_share": settings.BANDWIDTH_BULK_SHARE,
+                "interactive_bytes": INTERACTIVE_BYTES,
+            },
+            "bytes_per_sec": round(rate),
+            "utilisation": round(rate / limit, 3) if limit else None,
+            "interactive_busy": self.interactive_busy(),
+            "clients": [
+                {
+                    "client": c.label,
+                    "streams": c.streams,
+                    "bytes_per_sec": round(c.meter.current()),
+                    "bytes_sent": c.meter.total,
+                }
+                for c in self.clients.values()
+            ],
+            "streams": [
+                {
+                    "path": s.path,
+                    "client": s.client.label,
+                    "kind": "bulk" if s.bulk else "interactive",
+                    "bytes_sent": s.sent,
+                    "seconds": round(time.time() - s.started, 1),
+                }
+                for s in self.streams.values()
+            ],
+        }
+
+
+SCHEDULER = BandwidthScheduler()
+
+
+class InteractiveRequestMiddleware:
+    """Counts in-flight requests that aren't streams or uploads in SCHEDULER.interactive_requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(NON_INTERACTIVE_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        SCHEDULER.interactive_requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            SCHEDULER.interactive_requests -= 1
+
+
+class _PacedMixin:
+    """Paces every body message of the wrapped response through SCHEDULER."""
+
+    def _init_pacing(self, request: Request, path: str, bulk: bool) -> None:
+        self._pacing = (request, path, bulk)
+
+    async def __call__(self, scope, receive, send):
+        request, path, bulk = self._pacing
+        stream = SCHEDULER.open(request, path, bulk)
+
+        async def paced_send(message):
+            if message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body:
+                    await SCHEDULER.pace(stream, len(body))
+            await send(message)
+
+        try:
+            await super().__call__(scope, receive, paced_send)
+        finally:
+            SCHEDULER.close(stream)
+
+
+class PacedStreamingResponse(_PacedMixin, StreamingResponse):
+    def __init__(self, content, *, request: Request, path: str, bulk: bool = False, **kwargs):
+        super().__init__(content, **kwargs)
+        self._init_pacing(request, path, bulk)
+
+
+class PacedFileResponse(_PacedMixin, FileResponse):
+    def __init__(self, file_path: str, *, request: Request, bulk: bool = False, **kwargs):
+        super().__init__(file_path, **kwargs)
+        self._init_pacing(request, file_path, bulk)
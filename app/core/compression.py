@@ -0,0 +1,211 @@
+"""
+Media-aware response compression.
+
+Unlike Starlette's GZipMiddleware this only touches compressible content
+types, leaves ranged/partial and already-encoded responses alone, and
+negotiates zstd or brotli (when installed and accepted by the client)
+before falling back to gzip.
+"""
+import zlib
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # optional codec
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional codec
+    brotli = None
+
+# Only these content types are worth spending CPU on. Images, video, audio
+# and archives are already compressed.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/xhtml+xml",
+    "image/svg+xml",
+    "application/msgpack",
+)
+# Streamed line-by-line to the client; compression buffering would stall it
+NEVER_COMPRESS_TYPES = ("text/event-stream",)
+
+
+class _GzipCodec:
+    encoding = "gzip"
+
+    def __init__(self):
+        self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCodec:
+    encoding = "br"
+
+    def __init__(self):
+        # Quality 4 is the usual sweet spot for dynamic responses
+        self._obj = brotli.Compressor(quality=4)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCodec:
+    encoding = "zstd"
+
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def _available_codecs() -> List[Tuple[str, type]]:
+    codecs = []
+    if zstandard is not None:
+        codecs.append(("zstd", _ZstdCodec))
+    if brotli is not None:
+        codecs.append(("br", _BrotliCodec))
+    codecs.append(("gzip", _GzipCodec))
+    return codecs
+
+
+CODECS = _available_codecs()
+
+
+def parse_accept_encoding(value: str) -> dict:
+    """Map each accepted coding to its q-value (`*` included)."""
+    accepted = {}
+    for part in value.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_codec(accept_encoding: str) -> Optional[type]:
+    """
+    Pick the codec with the highest q-value the client accepts; ties go to the
+    server's preference order (CODECS). None if nothing is acceptable.
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding, codec in CODECS:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(NEVER_COMPRESS_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI compression stage. Skips incompressible media, ranged (206)
+    responses, responses that already carry a Content-Encoding, and bodies
+    smaller than `minimum_size`.
+    """
+
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codec_cls = choose_codec(Headers(scope=scope).get("accept-encoding", ""))
+        if codec_cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        codec = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, codec, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    message["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or "content-range" in headers
+                    or not is_compressible(headers.get("content-type", ""))
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until we know the body size
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if codec is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                codec = codec_cls()
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = codec.encoding
+                headers.add_vary_header("Accept-Encoding")
+
+                if not more_body:
+                    compressed = codec.compress(body) + codec.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                del headers["Content-Length"]
+                await send(start_message)
+
+            chunk = codec.compress(body)
+            if not more_body:
+                chunk += codec.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -29,7 +29,62 @@ class Settings(BaseSettings):
     
     # Path to the app-local trash directory
     TRASH_DIR: str = ("TRASH_DIR")
-    
+
+    # Expose Prometheus metrics at /metrics (loopback scrapes skip the PIN)
+    METRICS_ENABLED: bool = True
+
+    # Requests slower than this are logged with their stage timings
+    SLOW_REQUEST_MS: int = 1000
+
+    # Allow authenticated clients to profile a request with `X-Profile: 1`
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "./Profiles"
+
+    # Root directory for generated caches (HLS segments, thumbnails, ...)
+    CACHE_DIR: str = "./Cache"
+
+    # Video transcoding: HLS segment length and on-disk segment cache quota
+    HLS_SEGMENT_SECONDS: int = 6
+    TRANSCODE_CACHE_MAX_MB: int = 4096
+
+    # Screen-sized image previews: on-disk cache quota (least recently used evicted first)
+    PREVIEW_CACHE_MAX_MB: int = 2048
+
+    # Grid thumbnails and hover-scrub sprites: on-disk cache quota (least recently used evicted first)
+    THUMBNAIL_CACHE_MAX_MB: int = 1024
+
+    # Video thumbnails: seek point (percent of duration) and hover-scrub sprite frame count
+    VIDEO_THUMBNAIL_OFFSET_PERCENT: float = 10.0
+    VIDEO_SPRITE_FRAMES: int = 10
+
+    # Text viewer: how often a live tail checks the file for appended lines
+    TEXT_TAIL_POLL_SECONDS: float = 1.0
+
+    # Duplicate finder: hashing threads (0 = one per CPU) and combined read-rate cap (0 = unlimited)
+    DUPLICATE_HASH_WORKERS: int = 0
+    DUPLICATE_HASH_MB_PER_SEC: int = 200
+
+    # Media metadata extraction (EXIF, ffprobe) worker threads
+    METADATA_WORKERS: int = 4
+
+    # Copy/move jobs: threads copying small files concurrently
+    TRANSFER_WORKERS: int = 8
+
+    # Resumable uploads: sessions idle this long are discarded with their partial data
+    UPLOAD_SESSION_HOURS: int = 24
+
+    # File streams (/view, /download, /archive/view): bandwidth caps in MB/s, total and per session (0 = unlimited),
+    # and the share of the total that bulk transfers may use while interactive requests are running
+    BANDWIDTH_GLOBAL_MB_PER_SEC: float = 0
+    BANDWIDTH_CLIENT_MB_PER_SEC: float = 0
+    BANDWIDTH_BULK_SHARE: float = 0.5
+
+    # Background pre-warming of the next page's thumbnails and visible subfolders after each listing:
+    # seconds of work allowed per page, and the share of one core the prefetch thread may use
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_BUDGET_SECONDS: float = 10.0
+    PREFETCH_CPU_SHARE: float = 0.25
+
     class Config:
         env_file = ".env"
         extra = "ignore" # Allow extra fields in env file or ignored fields
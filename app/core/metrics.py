@@ -0,0 +1,246 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain dicts keyed by label tuples and
+guarded by a single lock, so recording a sample costs a dict lookup and an
+addition. Rendering happens only when `/metrics` is scraped.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+_LOCK = threading.Lock()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        self._values: Dict[Tuple[str, ...], float] = {}
+        super().__init__(*args, **kwargs)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with _LOCK:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down per label set."""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with _LOCK:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution per label set."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _LOCK:
+            slot = self._values.get(key)
+            if slot is None:
+                slot = self._values[key] = [0] * (len(self.buckets) + 2)
+            slot[index] += 1
+            slot[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the wall time spent inside the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with _LOCK:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, slot in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, slot):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += slot[len(self.buckets)]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {slot[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        lines.extend(_render_cache_ratios())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- HTTP ---
+HTTP_REQUESTS = Counter("fileex_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("fileex_http_request_duration_seconds", "Time from request to last response byte.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("fileex_http_requests_in_flight", "Requests currently being served.")
+HTTP_RESPONSE_BYTES = Counter("fileex_http_response_bytes_total", "Response body bytes sent, by route.", ("route",))
+
+# --- Media ---
+THUMBNAIL_SECONDS = Histogram("fileex_thumbnail_duration_seconds", "Thumbnail generation time.", ("kind",))
+FFMPEG_FAILURES = Counter("fileex_ffmpeg_failures_total", "ffmpeg invocations that failed or timed out.", ("operation",))
+TRANSCODE_SECONDS = Histogram("fileex_transcode_segment_duration_seconds", "Time to render one HLS segment.", ("mode",),
+                              buckets=(0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0))
+ARCHIVE_OPEN_SECONDS = Histogram("fileex_archive_open_duration_seconds", "Time to open and list an archive.", ("format",))
+
+# --- Request coalescing ---
+SINGLEFLIGHT_CALLS = Counter("fileex_singleflight_calls_total",
+                             "Single-flight calls by group and result (executed, or coalesced onto an identical in-flight call).",
+                             ("group", "result"))
+
+# --- Bandwidth ---
+BANDWIDTH_BYTES = Counter("fileex_bandwidth_bytes_total", "File stream bytes sent, by class (interactive/bulk).", ("kind",))
+BANDWIDTH_WAIT_SECONDS = Counter("fileex_bandwidth_wait_seconds_total",
+                                 "Time file streams spent throttled by the bandwidth limits, by class.", ("kind",))
+
+# --- Prefetch ---
+PREFETCH_ITEMS = Counter("fileex_prefetch_items_total", "Items pre-warmed in the background, by kind (thumbnail/folder).", ("kind",))
+PREFETCH_JOBS = Counter("fileex_prefetch_jobs_total", "Prefetch jobs by outcome (completed, cancelled, budget, failed).", ("result",))
+
+# --- Caches ---
+CACHE_REQUESTS = Counter("fileex_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+
+
+def cache_hit(cache: str) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit")
+
+
+def cache_miss(cache: str) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="miss")
+
+
+def _render_cache_ratios() -> List[str]:
+    with _LOCK:
+        values = dict(CACHE_REQUESTS._values)
+    caches = sorted({cache for cache, _ in values})
+    if not caches:
+        return []
+    lines = [
+        "# HELP fileex_cache_hit_ratio Fraction of cache lookups that were hits.",
+        "# TYPE fileex_cache_hit_ratio gauge",
+    ]
+    for cache in caches:
+        hits = values.get((cache, "hit"), 0)
+        total = hits + values.get((cache, "miss"), 0)
+        lines.append(f'fileex_cache_hit_ratio{{cache="{_escape(cache)}"}} {hits / total if total else 0}')
+    return lines
+
+
+def route_label(scope) -> str:
+    """Use the matched route template so label cardinality stays bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency, in-flight requests
+    and response bytes. Streaming bodies pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = route_label(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            if sent:
+                HTTP_RESPONSE_BYTES.inc(sent, route=route)
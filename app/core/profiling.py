@@ -0,0 +1,199 @@
+"""
+Per-request stage timings, slow-request capture and opt-in cProfile runs.
+
+Code on the request path marks its phases with `stage("scan")` etc. The
+timings only accumulate while `ProfilingMiddleware` has opened a
+request context, so calling `stage()` elsewhere (scripts, background
+jobs) is a cheap no-op.
+"""
+import asyncio
+import cProfile
+import functools
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.metrics import route_label
+
+logger = logging.getLogger("fileex.slow")
+
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+# Profiler of the current request, picked up by ProfiledRoute in whichever thread runs the endpoint
+_active_profiler: ContextVar[Optional[cProfile.Profile]] = ContextVar("active_profiler", default=None)
+# cProfile hooks are per thread on 3.11 and interpreter-wide on 3.12+: one profiled request at a time
+_profile_lock = threading.Lock()
+
+# Most recent slow requests, newest last
+SLOW_REQUESTS: Deque[Dict[str, Any]] = deque(maxlen=200)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Add an already-measured duration to stage `name` of the current request."""
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """Accumulate the wall time of the `with` block under `name` for the current request."""
+    if _stage_timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def get_profile_dir() -> str:
+    """Ensure PROFILE_DIR exists and return its absolute path."""
+    profile_dir = os.path.abspath(settings.PROFILE_DIR)
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+
+def _profiled(endpoint):
+    """Wrap an endpoint so it runs under the request's profiler, if any."""
+    if getattr(endpoint, "_profiled", False):
+        return endpoint
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profiler = _active_profiler.get()
+            if profiler is None:
+                return await endpoint(*args, **kwargs)
+            profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profiler = _active_profiler.get()
+            if profiler is None:
+                return endpoint(*args, **kwargs)
+            profiler.enable()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+    wrapper._profiled = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class for all routers. Sync endpoints run in threadpool workers, where
+    a profiler enabled by the middleware on the event-loop thread can't see
+    them, so the profiler is enabled around the endpoint call itself.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _wants_profile(scope) -> bool:
+    if not settings.PROFILING_ENABLED:
+        return False
+    session = scope.get("session") or {}
+    if not session.get("authenticated"):
+        return False
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile" and value not in (b"", b"0"):
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("_profile", ["0"])[0] not in ("", "0")
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that collects stage timings for every request and logs
+    those slower than SLOW_REQUEST_MS. With PROFILING_ENABLED, an authenticated
+    request carrying `X-Profile: 1` (or `?_profile=1`) runs its endpoint under
+    cProfile (see ProfiledRoute); the stats are written to PROFILE_DIR and the id
+    is returned in `X-Profile-Id`. Only one request is profiled at a time; a
+    second one gets 409.
+
+    The slow-request threshold applies to the time until the response starts,
+    so long streamed bodies (downloads, video, tails) don't flood the log.
+
+    Must sit inside SessionMiddleware so the session is available in scope.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        profile_id = None
+        if _wants_profile(scope):
+            if not _profile_lock.acquire(blocking=False):
+                response = JSONResponse({"detail": "Another request is being profiled"}, status_code=409)
+                await response(scope, receive, send)
+                return
+            profile_id = uuid.uuid4().hex[:12]
+            profiler = cProfile.Profile()
+
+        timings: Dict[str, float] = {}
+        token = _stage_timings.set(timings)
+        profiler_token = _active_profiler.set(profiler)
+        started_at = None
+
+        async def send_wrapper(message):
+            nonlocal started_at
+            if message["type"] == "http.response.start":
+                started_at = time.perf_counter()
+                if profile_id is not None:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            elapsed = (started_at or end) - start
+            _stage_timings.reset(token)
+            _active_profiler.reset(profiler_token)
+            route = route_label(scope)
+            if profiler is not None:
+                try:
+                    profiler.dump_stats(os.path.join(get_profile_dir(), f"{profile_id}.prof"))
+                finally:
+                    _profile_lock.release()
+            if elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+                record = {
+                    "at": time.time(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route,
+                    "duration_ms": round(elapsed * 1000, 1),
+                    "total_ms": round((end - start) * 1000, 1),
+                    "stages_ms": {k: round(v * 1000, 1) for k, v in timings.items()},
+                    "profile_id": profile_id,
+                }
+                SLOW_REQUESTS.append(record)
+                logger.warning(
+                    "Slow request %s %s took %.1f ms to respond (stages: %s)",
+                    record["method"], record["path"], record["duration_ms"], record["stages_ms"],
+                )
@@ -0,0 +1,63 @@
+"""
+Compact listing responses.
+
+Large listings are dominated by repeated keys and pre-formatted strings.
+The compact format sends one array per column with raw integers (bytes,
+epoch seconds) and leaves formatting to the client:
+
+    {"format": "compact", "columns": ["name", "is_dir", "size"],
+     "data": {"name": [...], "is_dir": [1, 0], "size": [null, 1024]}, ...}
+
+Responses are encoded with MessagePack when the client sends
+`Accept: application/msgpack`, otherwise as JSON via orjson. Both encoders
+are optional and fall back to the standard library.
+"""
+from typing import Any, Dict, Iterable, List, Sequence
+
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional fast encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional binary encoder
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def to_columns(rows: Sequence[Dict[str, Any]], columns: Iterable[str]) -> Dict[str, Any]:
+    """Turn a list of dicts into {"columns": [...], "data": {column: [values...]}}."""
+    columns = [c for c in columns if any(c in row for row in rows)] if rows else list(columns)
+    data: Dict[str, List[Any]] = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        if column.startswith("is_"):
+            # Booleans as 0/1 keep the arrays short
+            values = [int(bool(v)) for v in values]
+        data[column] = values
+    return {"format": "compact", "columns": columns, "data": data}
+
+
+def wants_msgpack(accept: str) -> bool:
+    return msgpack is not None and any(t in (accept or "") for t in MSGPACK_TYPES)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def encode_response(payload: Any, accept: str = "") -> Response:
+    """Serialize `payload` as MessagePack or JSON depending on the Accept header."""
+    headers = {"Vary": "Accept"}
+    if wants_msgpack(accept):
+        return Response(msgpack.packb(payload, use_bin_type=True), media_type=MSGPACK_TYPES[0], headers=headers)
+    return FastJSONResponse(payload, headers=headers)
@@ -0,0 +1,178 @@
+"""
+State shared between worker processes.
+
+With WORKERS > 1 every uvicorn worker is its own process, so module-level
+dicts and threading locks only cover the requests that land on that worker.
+Small shared state (login attempts, background-job progress, ffprobe results)
+lives in one SQLite database, CACHE_DIR/state.sqlite, in WAL mode so readers
+never wait on the writer. Cache generation is serialized across processes
+with `lock_for()`, which pairs a thread lock with an flock() on a lock file.
+Keys are hashed onto a fixed set of LOCK_STRIPES locks, so the lock files and
+the in-process lock table stay bounded however many keys are used.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover the current process
+    fcntl = None
+
+# Unrelated keys may share a stripe: lock_for() locks must never be nested
+LOCK_STRIPES = 256
+
+
+class SharedState:
+    """
+    Namespaced key/value store with optional expiry, plus timestamped events
+    (for sliding-window rate limits). Values are stored as JSON.
+    """
+
+    _conn: Optional[sqlite3.Connection] = None
+    _db_lock = threading.Lock()
+
+    @staticmethod
+    def _db() -> sqlite3.Connection:
+        if SharedState._conn is None:
+            cache_dir = os.path.abspath(settings.CACHE_DIR)
+            os.makedirs(cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(cache_dir, "state.sqlite"), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "namespace TEXT, key TEXT, value TEXT, expires REAL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS events (namespace TEXT, key TEXT, ts REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS events_key ON events (namespace, key, ts)")
+            conn.commit()
+            SharedState._conn = conn
+        return SharedState._conn
+
+    @staticmethod
+    def get(namespace: str, key: str) -> Any:
+        """The stored value, or None if missing or expired."""
+        with SharedState._db_lock:
+            row = SharedState._db().execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def put(namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires = time.time() + ttl if ttl else None
+        with SharedState._db_lock:
+            conn = SharedState._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires)
+            )
+            conn.commit()
+
+    @staticmethod
+    def delete(namespace: str, key: str) -> None:
+        with SharedState._db_lock:
+            conn = SharedState._db()
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+
+    @staticmethod
+    def values(namespace: str) -> Dict[str, Any]:
+        """All live entries of a namespace; expired rows are purged on the way."""
+        now = time.time()
+        with SharedState._db_lock:
+            conn = SharedState._db()
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND expires <= ?", (namespace, now))
+            conn.commit()
+            rows = conn.execute("SELECT key, value FROM kv WHERE namespace = ?", (namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    @staticmethod
+    def try_add_event(namespace: str, key: str, window: float, limit: int) -> bool:
+        """
+        Record an event now unless `key` already has `limit` events in the last
+        `window` seconds. Count and insert share one write transaction, so
+        concurrent callers in other workers can't all slip under the limit.
+        """
+        now = time.time()
+        with SharedState._db_lock:
+            conn = SharedState._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM events WHERE namespace = ? AND ts <= ?", (namespace, now - window))
+                count = conn.execute(
+                    "SELECT COUNT(*) FROM events WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()[0]
+                if count >= limit:
+                    conn.rollback()
+                    return False
+                conn.execute("INSERT INTO events (namespace, key, ts) VALUES (?, ?, ?)", (namespace, key, now))
+                conn.commit()
+                return True
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @staticmethod
+    def clear_events(namespace: str, key: str) -> None:
+        with SharedState._db_lock:
+            conn = SharedState._db()
+            conn.execute("DELETE FROM events WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+
+
+class SharedLock:
+    """
+    Mutual exclusion for one lock stripe across threads and worker processes. The
+    thread lock is taken first so a process holds at most one flock per stripe.
+    """
+
+    def __init__(self, stripe: int):
+        self._thread_lock = threading.Lock()
+        self._path = os.path.join(os.path.abspath(settings.CACHE_DIR), "locks", f"{stripe:03d}.lock")
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            # Closing the descriptor releases the flock
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+        return False
+
+
+_locks: Dict[int, SharedLock] = {}
+_locks_guard = threading.Lock()
+
+
+def lock_for(key: str) -> SharedLock:
+    """The process-wide SharedLock guarding `key` (e.g. a cache file path)."""
+    stripe = int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % LOCK_STRIPES
+    with _locks_guard:
+        lock = _locks.get(stripe)
+        if lock is None:
+            lock = _locks[stripe] = SharedLock(stripe)
+        return lock
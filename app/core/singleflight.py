@@ -0,0 +1,62 @@
+"""
+In-process request coalescing ("single flight").
+
+When several threads ask for the same expensive result at once (the grid
+re-rendering, a retry, a second tab), only the first one runs the function;
+the others block until it finishes and receive the same return value or
+exception. Nothing is cached afterwards: the next call with that key runs
+again, so results still go through whatever cache the function itself uses.
+
+Callers get the leader's return value itself, so they must not mutate it.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from app.core.metrics import SINGLEFLIGHT_CALLS
+from app.core.profiling import stage
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """A named group of in-flight calls; `name` labels the coalescing metric."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` unless a call with the same `key` is already running; then wait for it."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_CALLS.inc(group=self.name, result="coalesced")
+            with stage("coalesced"):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLEFLIGHT_CALLS.inc(group=self.name, result="executed")
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -2,13 +2,15 @@ import os
 from pathlib import Path
 
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, PlainTextResponse
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.middleware.gzip import GZipMiddleware
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.assets import PrecompressedStaticFiles, register_template_globals
+from app.core.bandwidth import InteractiveRequestMiddleware
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
 
 from app.api.router import api_router
 from app.api.endpoints import auth
@@ -34,15 +36,47 @@ mimetypes.add_type('video/x-msvideo', '.avi')
 # Routes that don't require authentication
 PUBLIC_PATHS = ("/login", "/static")
 
+# Clients allowed to scrape /metrics without a session
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Combined auth + read-only enforcement middleware."""
 
-    async def dispatch(self, request: Request, call_next):
+class SecurityMiddleware:
+    """
+    Combined auth + read-only enforcement middleware.
+
+    Written as pure ASGI so allowed requests (including multi-GB streams)
+    pass straight through without BaseHTTPMiddleware's task/queue wrapping.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response = self.check(Request(scope))
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def check(request: Request):
+        """Return an error/redirect response if the request must be rejected, else None."""
         path = request.url.path
 
+        # Local Prometheus scrapes don't carry a session cookie
+        is_local_scrape = (
+            path == "/metrics"
+            and request.client is not None
+            and request.client.host in LOOPBACK_HOSTS
+        )
+
         # Skip auth for public paths (login page, static assets)
-        if not any(path.startswith(p) for p in PUBLIC_PATHS):
+        if not is_local_scrape and not any(path.startswith(p) for p in PUBLIC_PATHS):
             if not request.session.get("authenticated"):
                 if path.startswith("/api/"):
                     return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
@@ -52,20 +86,24 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         if settings.READ_ONLY and request.method not in ("GET", "HEAD", "OPTIONS", "POST"):
             return JSONResponse(status_code=405, content={"detail": "Method Not Allowed: Server is in Read-Only Mode"})
 
-        response = await call_next(request)
-        return response
+        return None
 
 
 # Middleware stack (LIFO order)
+app.add_middleware(ProfilingMiddleware)  # Innermost: needs the session, times the handler
+app.add_middleware(InteractiveRequestMiddleware)  # Lets bulk streams yield to short API requests
 app.add_middleware(SecurityMiddleware)
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
-app.add_middleware(GZipMiddleware, minimum_size=500)  # Compress responses > 500 bytes
+app.add_middleware(CompressionMiddleware, minimum_size=500)  # Compress text/JSON responses > 500 bytes
+app.add_middleware(MetricsMiddleware)  # Outermost: times the full stack
 
 # Mount static files (CSS, JS, Images)
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
+# Hashed files under static/dist are served precompressed and immutable
+app.mount("/static", PrecompressedStaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
 # Templates
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+register_template_globals(templates)
 
 # Include Auth routes (at root level, not under /api)
 app.include_router(auth.router)
@@ -79,6 +117,13 @@ async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request, "read_only": settings.READ_ONLY})
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=6979, reload=True)
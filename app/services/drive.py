@@ -6,10 +6,24 @@ from app.utils.formatters import format_size, format_timestamp
 import shutil
 import json
 import uuid
+import mimetypes
+import stat as stat_module
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from app.core.config import settings
+from app.core.profiling import stage
+from app.core.singleflight import SingleFlight
+from app.services.metadata import MetadataService, METADATA_SORT_KEYS
+
+# Sort keys accepted by list_directory
+SORT_KEYS = ("name", "size", "modified") + METADATA_SORT_KEYS
 
 class DriveService:
+    # stat() releases the GIL, so batches overlap well on slow or network filesystems
+    _hydrate_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hydrate")
+    # Identical listings requested concurrently share one scan
+    _listing_flight = SingleFlight("listing")
+
     @staticmethod
     def get_drives() -> List[Dict[str, Any]]:
         """
@@ -86,10 +100,25 @@ class DriveService:
         return drives
 
     @staticmethod
-    def list_directory(path: str, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+    def list_directory(path: str, skip: int = 0, limit: int = 100, sort: str = "name",
+                       order: str = "asc", metadata: bool = False, names_only: bool = False,
+                       raw: bool = False) -> Dict[str, Any]:
         """
         List contents of a directory with pagination.
+        `sort` is one of SORT_KEYS (directories always come first); `metadata`
+        adds a `meta` dict (dimensions, date taken, duration, codecs) to media files.
+        `names_only` returns names and types straight from scandir without stat'ing
+        anything; fill in the rest for visible rows with `hydrate()`.
+        `raw` leaves size (bytes) and modified (epoch seconds) as integers for compact responses.
+        Concurrent calls with the same arguments are coalesced and get the same
+        (shared) result, so callers must not modify it.
         """
+        key = (path, skip, limit, sort, order, metadata, names_only, raw)
+        return DriveService._listing_flight.do(key, DriveService._list_directory, *key)
+
+    @staticmethod
+    def _list_directory(path: str, skip: int, limit: int, sort: str, order: str,
+                        metadata: bool, names_only: bool, raw: bool) -> Dict[str, Any]:
         if not path:
              drives = DriveService.get_drives()
              return {
@@ -111,36 +140,66 @@ class DriveService:
              raise NotADirectoryError(f"Path is not a directory: {path}")
 
         try:
-            # First, quickly gather all directory entry objects without stat'ing them broadly
+            # First, quickly gather all directory entry objects without stat'ing them broadly.
+            # is_dir() comes from d_type where the filesystem provides it; ask once per entry.
             entries = []
-            with os.scandir(path) as it:
+            with stage("scan"), os.scandir(path) as it:
                 for entry in it:
-                     entries.append(entry)
+                     entries.append((entry, entry.is_dir()))
         except PermissionError:
             raise PermissionError(f"Permission denied: {path}")
 
-        # Sort: Directories first, then files. Both alphabetical.
-        entries.sort(key=lambda x: (not x.is_dir(), x.name.lower()))
+        # Sort: Directories first, then files by the requested key (name as tiebreak)
+        meta = {}
+        descending = order == "desc"
+        if sort in METADATA_SORT_KEYS:
+            with stage("metadata"):
+                meta = MetadataService.get_many([e.path for e, is_dir in entries if not is_dir])
+        with stage("sort"):
+            entries.sort(key=lambda x: x[0].name.lower(), reverse=descending and sort == "name")
+            if sort != "name":
+                def sort_key(pair):
+                    value = DriveService._sort_value(pair[0], pair[1], sort, meta)
+                    # Entries without a value go last in either direction
+                    if value is None:
+                        return (1, 0)
+                    return (0, -value if descending else value)
+                entries.sort(key=sort_key)
+            entries.sort(key=lambda x: not x[1])
         
         total = len(entries)
         paginated_entries = entries[skip : skip + limit]
         
         items = []
-        for entry in paginated_entries:
-            try:
-                stat = entry.stat()
+        with stage("stat"):
+            for entry, is_dir in paginated_entries:
                 item = {
                     "name": entry.name,
                     "path": entry.path,
-                    "is_dir": entry.is_dir(),
-                    "size": format_size(stat.st_size) if not entry.is_dir() else "-",
-                    "modified": format_timestamp(stat.st_mtime),
-                    "type": "folder" if entry.is_dir() else "file"
+                    "is_dir": is_dir,
+                    "type": "folder" if is_dir else "file"
                 }
+                if not names_only:
+                    try:
+                        stat = entry.stat()
+                    except PermissionError:
+                        # Skip files we don't have permission to stat
+                        continue
+                    if raw:
+                        item["size"] = stat.st_size if not is_dir else None
+                        item["modified"] = int(stat.st_mtime)
+                    else:
+                        item["size"] = format_size(stat.st_size) if not is_dir else "-"
+                        item["modified"] = format_timestamp(stat.st_mtime)
                 items.append(item)
-            except PermissionError:
-                # Skip files we don't have permission to stat
-                continue
+
+        if metadata and not names_only:
+            with stage("metadata"):
+                missing = [i["path"] for i in items if not i["is_dir"] and i["path"] not in meta]
+                meta.update(MetadataService.get_many(missing))
+                for item in items:
+                    if item["path"] in meta:
+                        item["meta"] = meta[item["path"]]
 
         return {
             "items": items,
@@ -150,6 +209,53 @@ class DriveService:
             "limit": limit
         }
 
+    @staticmethod
+    def _sort_value(entry: os.DirEntry, is_dir: bool, sort: str, meta: Dict[str, Any]) -> Union[float, None]:
+        if sort in METADATA_SORT_KEYS:
+            return MetadataService.sort_value(meta.get(entry.path), sort)
+        try:
+            stat = entry.stat()
+        except OSError:
+            return None
+        if sort == "size":
+            return stat.st_size if not is_dir else None
+        return stat.st_mtime
+
+    @staticmethod
+    def _hydrate_one(path: str) -> Dict[str, Any]:
+        from app.utils.security import validate_path
+        try:
+            validate_path(path)
+            stat = os.stat(path)
+        except PermissionError:
+            return {"error": "Permission denied"}
+        except OSError:
+            return {"error": "Not found"}
+        is_dir = stat_module.S_ISDIR(stat.st_mode)
+        return {
+            "is_dir": is_dir,
+            "size": format_size(stat.st_size) if not is_dir else "-",
+            "size_bytes": stat.st_size if not is_dir else None,
+            "modified": format_timestamp(stat.st_mtime),
+            "mime": None if is_dir else (mimetypes.guess_type(path)[0] or "application/octet-stream"),
+        }
+
+    @staticmethod
+    def hydrate(paths: List[str], metadata: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Stat a batch of paths concurrently (companion to `names_only` listings).
+        Returns {path: details}; unreadable paths get an `error` instead.
+        """
+        unique = list(dict.fromkeys(paths))
+        with stage("stat"):
+            results = dict(zip(unique, DriveService._hydrate_pool.map(DriveService._hydrate_one, unique)))
+        if metadata:
+            with stage("metadata"):
+                meta = MetadataService.get_many([p for p, r in results.items() if r.get("is_dir") is False])
+                for path, value in meta.items():
+                    results[path]["meta"] = value
+        return results
+
     @staticmethod
     def _get_trash_dir() -> str:
         """Ensure TRASH_DIR exists and return its absolute path."""
@@ -196,9 +302,10 @@ class DriveService:
             raise Exception(f"Failed to move item to trash: {str(e)}")
 
     @staticmethod
-    def list_trash() -> List[Dict[str, Any]]:
+    def list_trash(raw: bool = False) -> List[Dict[str, Any]]:
         """
         List all items in the Trash directory based on metadata files.
+        With `raw`, size is in bytes and deleted_at is epoch seconds (no formatted fields).
         """
         trash_dir = DriveService._get_trash_dir()
         items = []
@@ -216,7 +323,10 @@ class DriveService:
                         # Add stats if the file still exists in trash
                         if os.path.exists(trashed_file_path):
                             stat = os.stat(trashed_file_path)
-                            meta["size"] = format_size(stat.st_size) if not meta.get("is_dir", False) else "-"
+                            if raw:
+                                meta["size"] = stat.st_size if not meta.get("is_dir", False) else None
+                            else:
+                                meta["size"] = format_size(stat.st_size) if not meta.get("is_dir", False) else "-"
                             items.append(meta)
                         else:
                             # Orphaned metadata file
@@ -228,6 +338,14 @@ class DriveService:
              
         # Sort by deletion time descending (newest first)
         items.sort(key=lambda x: x.get("deleted_at", ""), reverse=True)
+
+        if raw:
+            for item in items:
+                try:
+                    item["deleted_at"] = int(datetime.fromisoformat(item["deleted_at"]).timestamp())
+                except (KeyError, ValueError):
+                    item["deleted_at"] = None
+            return items
         
         # Format dates for UI
         for item in items:
@@ -0,0 +1,436 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import cache_hit, cache_miss
+from app.core.shared_state import SharedState, lock_for
+from app.utils.formatters import format_size
+
+# Bytes hashed from each end of a file in the partial-hash stage
+PARTIAL_BYTES = 64 * 1024
+HASH_CHUNK = 1024 * 1024
+# Job progress is published to SharedState so any worker process can report or cancel it.
+# A running job's entry expires unless its worker keeps refreshing it.
+JOBS_NAMESPACE = "duplicate_jobs"
+CANCEL_NAMESPACE = "duplicate_cancel"
+PUBLISH_INTERVAL = 1.0
+RUNNING_TTL = 30
+FINISHED_TTL = 86400
+
+
+class _Throttle:
+    """Shared token bucket capping the combined read rate of all hashing workers."""
+
+    def __init__(self, bytes_per_sec: int):
+        self.rate = bytes_per_sec
+        self.allowance = float(bytes_per_sec)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount: int) -> None:
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= amount
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class _HashStore:
+    """
+    Persistent (path, size, mtime) -> hash cache, so rescans only hash new or changed files.
+    Only the job thread touches the connection.
+    """
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        # Scans running in other worker processes share the database
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, partial TEXT, full TEXT)"
+        )
+
+    def get(self, path: str, size: int, mtime: float) -> Tuple[Optional[str], Optional[str]]:
+        row = self.conn.execute(
+            "SELECT partial, full FROM hashes WHERE path = ? AND size = ? AND mtime = ?",
+            (path, size, mtime)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def put(self, path: str, size: int, mtime: float, partial: Optional[str], full: Optional[str]) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO hashes (path, size, mtime, partial, full) VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime, partial, full)
+        )
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+class DuplicateService:
+    """
+    Background duplicate finder.
+
+    Files under a root are grouped by size; same-size files are compared by a
+    partial hash of their first and last 64 KiB, and only files that still
+    collide are hashed in full. Hashing runs on a thread pool (hashlib releases
+    the GIL) behind a shared read-rate throttle. Hashes are cached in SQLite by
+    (path, size, mtime) and the last result per root is kept on disk; groups are
+    re-checked against current mtimes whenever they are read.
+
+    The job runs in the worker process that started it; its progress is
+    mirrored to SharedState so status and cancel requests work from any worker.
+    """
+
+    _jobs: Dict[str, Dict[str, Any]] = {}
+    _jobs_lock = threading.Lock()
+    # Hash workers update job progress concurrently
+    _progress_lock = threading.Lock()
+
+    @staticmethod
+    def _cache_dir() -> str:
+        cache_dir = os.path.join(os.path.abspath(settings.CACHE_DIR), "duplicates")
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
+    @staticmethod
+    def _result_path(root: str) -> str:
+        digest = hashlib.sha1(root.encode("utf-8")).hexdigest()
+        return os.path.join(DuplicateService._cache_dir(), f"{digest}.json")
+
+    @staticmethod
+    def start(root: str, min_size: int) -> Dict[str, Any]:
+        """Start a scan of `root`, or return the scan already running for it."""
+        root = os.path.abspath(root)
+        with lock_for("duplicates|" + root), DuplicateService._jobs_lock:
+            for job in DuplicateService._jobs.values():
+                if job["root"] == root and job["state"] in ("queued", "running"):
+                    return DuplicateService._public(job)
+            for job in SharedState.values(JOBS_NAMESPACE).values():
+                if job["root"] == root and job["state"] in ("queued", "running"):
+                    return job
+            job = {
+                "id": uuid.uuid4().hex,
+                "root": root,
+                "min_size": min_size,
+                "state": "queued",
+                "stage": None,
+                "files_scanned": 0,
+                "candidates": 0,
+                "hashed_bytes": 0,
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "error": None,
+                "cancel": threading.Event(),
+            }
+            DuplicateService._jobs[job["id"]] = job
+            # Keep only the most recent finished jobs
+            finished = [j for j in DuplicateService._jobs.values() if j["state"] not in ("queued", "running")]
+            for old in finished[:-20]:
+                DuplicateService._jobs.pop(old["id"], None)
+            SharedState.put(JOBS_NAMESPACE, job["id"], DuplicateService._public(job), ttl=RUNNING_TTL)
+
+        threading.Thread(target=DuplicateService._run, args=(job,), name="duplicate-scan", daemon=True).start()
+        threading.Thread(target=DuplicateService._publish, args=(job,), name="duplicate-publish", daemon=True).start()
+        return DuplicateService._public(job)
+
+    @staticmethod
+    def _publish(job: Dict[str, Any]) -> None:
+        """Mirror a running job's progress to SharedState and pick up cancels sent to other workers."""
+        while job["finished_at"] is None:
+            SharedState.put(JOBS_NAMESPACE, job["id"], DuplicateService._public(job), ttl=RUNNING_TTL)
+            if SharedState.get(CANCEL_NAMESPACE, job["id"]):
+                job["cancel"].set()
+            time.sleep(PUBLISH_INTERVAL)
+        SharedState.put(JOBS_NAMESPACE, job["id"], DuplicateService._public(job), ttl=FINISHED_TTL)
+        SharedState.delete(CANCEL_NAMESPACE, job["id"])
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in job.items() if k != "cancel"}
+
+    @staticmethod
+    def get_job(job_id: str) -> Dict[str, Any]:
+        job = DuplicateService._jobs.get(job_id)
+        if job is not None:
+            return DuplicateService._public(job)
+        # Started by another worker process
+        shared = SharedState.get(JOBS_NAMESPACE, job_id)
+        if shared is None:
+            raise KeyError(job_id)
+        return shared
+
+    @staticmethod
+    def cancel(job_id: str) -> None:
+        job = DuplicateService._jobs.get(job_id)
+        if job is not None:
+            job["cancel"].set()
+            return
+        if SharedState.get(JOBS_NAMESPACE, job_id) is None:
+            raise KeyError(job_id)
+        # The owning worker's publisher thread sees this and cancels the job
+        SharedState.put(CANCEL_NAMESPACE, job_id, True, ttl=RUNNING_TTL)
+
+    @staticmethod
+    def _walk(job: Dict[str, Any]) -> List[Tuple[str, int, float]]:
+        """Collect (path, size, mtime) for regular files, skipping symlinks, hardlink twins and restricted paths."""
+        from app.utils.security import validate_path
+
+        skip_dirs = {os.path.abspath(settings.TRASH_DIR), os.path.abspath(settings.CACHE_DIR)}
+        seen_inodes = set()
+        files = []
+        stack = [job["root"]]
+        while stack:
+            if job["cancel"].is_set():
+                break
+            current = stack.pop()
+            try:
+                validate_path(current)
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except (PermissionError, OSError):
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path not in skip_dirs:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if st.st_size < job["min_size"]:
+                    continue
+                # Hardlinks share storage, so they are never reclaimable duplicates
+                inode = (st.st_dev, st.st_ino)
+                if st.st_ino and inode in seen_inodes:
+                    continue
+                seen_inodes.add(inode)
+                files.append((entry.path, st.st_size, st.st_mtime))
+            job["files_scanned"] = len(files)
+        return files
+
+    @staticmethod
+    def _add_hashed(job: Dict[str, Any], amount: int) -> None:
+        with DuplicateService._progress_lock:
+            job["hashed_bytes"] += amount
+
+    @staticmethod
+    def _hash_file(path: str, size: int, partial: bool, throttle: _Throttle, job: Dict[str, Any]) -> Optional[str]:
+        if job["cancel"].is_set():
+            return None
+        digest = hashlib.blake2b(digest_size=20)
+        try:
+            with open(path, "rb") as f:
+                if partial:
+                    head = f.read(PARTIAL_BYTES)
+                    digest.update(head)
+                    if size > 2 * PARTIAL_BYTES:
+                        f.seek(size - PARTIAL_BYTES)
+                        digest.update(f.read(PARTIAL_BYTES))
+                    elif size > PARTIAL_BYTES:
+                        digest.update(f.read())
+                    throttle.consume(min(size, 2 * PARTIAL_BYTES))
+                    DuplicateService._add_hashed(job, min(size, 2 * PARTIAL_BYTES))
+                else:
+                    while chunk := f.read(HASH_CHUNK):
+                        if job["cancel"].is_set():
+                            return None
+                        throttle.consume(len(chunk))
+                        digest.update(chunk)
+                        DuplicateService._add_hashed(job, len(chunk))
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    @staticmethod
+    def _hash_stage(files, partial: bool, store: _HashStore, pool: ThreadPoolExecutor,
+                    throttle: _Throttle, job: Dict[str, Any]) -> Dict[tuple, list]:
+        """Hash `files` (cached where possible) and bucket them by (size, hash)."""
+        buckets = defaultdict(list)
+        todo = []
+        for path, size, mtime in files:
+            cached_partial, cached_full = store.get(path, size, mtime)
+            cached = cached_partial if partial else cached_full
+            if cached:
+                cache_hit("duplicate_hash")
+                buckets[(size, cached)].append((path, size, mtime))
+            else:
+                cache_miss("duplicate_hash")
+                todo.append((path, size, mtime))
+
+        futures = []
+        for item in todo:
+            if job["cancel"].is_set():
+                break
+            futures.append((item, pool.submit(DuplicateService._hash_file, item[0], item[1], partial, throttle, job)))
+        for (path, size, mtime), future in futures:
+            if job["cancel"].is_set():
+                # Drop queued hashes; running ones notice the flag and stop
+                future.cancel()
+                continue
+            value = future.result()
+            if value is None:
+                continue
+            if partial:
+                # Small files were read completely, so the partial hash is the full hash
+                store.put(path, size, mtime, value, value if size <= 2 * PARTIAL_BYTES else None)
+            else:
+                cached_partial, _ = store.get(path, size, mtime)
+                store.put(path, size, mtime, cached_partial, value)
+            buckets[(size, value)].append((path, size, mtime))
+        return buckets
+
+    @staticmethod
+    def _run(job: Dict[str, Any]) -> None:
+        job["state"] = "running"
+        store = None
+        try:
+            job["stage"] = "scan"
+            files = DuplicateService._walk(job)
+
+            if job["cancel"].is_set():
+                job["state"] = "cancelled"
+                return
+
+            job["stage"] = "size"
+            by_size = defaultdict(list)
+            for item in files:
+                by_size[item[1]].append(item)
+            candidates = [item for group in by_size.values() if len(group) > 1 for item in group]
+            job["candidates"] = len(candidates)
+
+            store = _HashStore(os.path.join(DuplicateService._cache_dir(), "hashes.sqlite"))
+            throttle = _Throttle(settings.DUPLICATE_HASH_MB_PER_SEC * 1024 * 1024)
+            workers = settings.DUPLICATE_HASH_WORKERS or os.cpu_count() or 4
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="duplicate-hash") as pool:
+                job["stage"] = "partial"
+                partial = DuplicateService._hash_stage(candidates, True, store, pool, throttle, job)
+                store.conn.commit()
+                if job["cancel"].is_set():
+                    job["state"] = "cancelled"
+                    return
+                remaining = [item for group in partial.values() if len(group) > 1 for item in group]
+                job["candidates"] = len(remaining)
+
+                job["stage"] = "full"
+                full = DuplicateService._hash_stage(remaining, False, store, pool, throttle, job)
+                store.conn.commit()
+
+            if job["cancel"].is_set():
+                job["state"] = "cancelled"
+                return
+
+            groups = [
+                {
+                    "hash": digest,
+                    "size": size,
+                    "files": [{"path": p, "mtime": m} for p, _, m in sorted(items)],
+                }
+                for (size, digest), items in full.items()
+                if len(items) > 1
+            ]
+            result = {
+                "root": job["root"],
+                "min_size": job["min_size"],
+                "scanned_at": datetime.now().isoformat(),
+                "files_scanned": job["files_scanned"],
+                "groups": groups,
+            }
+            target = DuplicateService._result_path(job["root"])
+            with open(target + ".part", "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(target + ".part", target)
+            job["state"] = "done"
+        except Exception as e:
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            if store is not None:
+                store.close()
+            job["stage"] = None
+            job["finished_at"] = datetime.now().isoformat()
+
+    @staticmethod
+    def results(root: str) -> Dict[str, Any]:
+        """
+        The last scan's duplicate groups under `root`, dropping files that were
+        deleted or modified since, with reclaimable bytes (all copies but one).
+        """
+        root = os.path.abspath(root)
+        try:
+            with open(DuplicateService._result_path(root), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            raise FileNotFoundError("No duplicate scan for this path yet")
+
+        groups = []
+        reclaimable = 0
+        for group in result["groups"]:
+            files = []
+            for entry in group["files"]:
+                try:
+                    st = os.stat(entry["path"])
+                except OSError:
+                    continue
+                if st.st_size == group["size"] and st.st_mtime == entry["mtime"]:
+                    files.append(entry)
+            if len(files) < 2:
+                continue
+            wasted = group["size"] * (len(files) - 1)
+            reclaimable += wasted
+            groups.append({
+                **group,
+                "files": files,
+                "size_fmt": format_size(group["size"]),
+                "reclaimable_bytes": wasted,
+            })
+        groups.sort(key=lambda g: g["reclaimable_bytes"], reverse=True)
+        return {
+            "root": result["root"],
+            "scanned_at": result["scanned_at"],
+            "files_scanned": result["files_scanned"],
+            "groups": groups,
+            "reclaimable_bytes": reclaimable,
+            "reclaimable": format_size(reclaimable),
+        }
+
+    @staticmethod
+    def trash_duplicates(root: str, paths: List[str]) -> List[str]:
+        """
+        Move the given copies to the Trash via DriveService.delete_file. Refuses
+        to remove the last remaining copy of any group.
+        """
+        from app.services.drive import DriveService
+
+        wanted = set(paths)
+        groups = DuplicateService.results(root)["groups"]
+        known = {entry["path"] for group in groups for entry in group["files"]}
+        unknown = wanted - known
+        if unknown:
+            raise ValueError(f"Not a known duplicate: {sorted(unknown)[0]}")
+        for group in groups:
+            if all(entry["path"] in wanted for entry in group["files"]):
+                raise ValueError(f"Refusing to trash every copy of {group['files'][0]['path']}")
+
+        trashed = []
+        for path in paths:
+            DriveService.delete_file(path)
+            trashed.append(path)
+        return trashed
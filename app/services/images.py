@@ -0,0 +1,173 @@
+import io
+import os
+import time
+from functools import lru_cache
+from typing import Tuple, Optional
+from PIL import Image, ImageOps, features
+from app.core.config import settings
+from app.core.constants import VIDEO_EXTENSIONS
+from app.core.metrics import THUMBNAIL_SECONDS, cache_hit, cache_miss
+from app.services.thumbnails import ThumbnailService
+
+# Long-edge sizes the viewer may request; arbitrary widths are snapped up to
+# one of these so the rendition cache stays small.
+PREVIEW_WIDTHS = (640, 1280, 1920, 2560, 3840)
+
+# Bounding-box sizes for grid thumbnails (CSS pixels); `scale=2` doubles them for HiDPI
+THUMBNAIL_SIZES = (128, 256, 512)
+
+# Output format name -> (Pillow format, mime type, file extension)
+OUTPUT_FORMATS = {
+    "avif": ("AVIF", "image/avif", "avif"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+
+# Encoder quality per format; AVIF and WebP look as good as JPEG at lower settings
+THUMBNAIL_QUALITY = {"avif": 55, "webp": 78, "jpeg": 82}
+
+
+@lru_cache(maxsize=1)
+def avif_supported() -> bool:
+    """True when this Pillow build can encode AVIF (libavif is optional)."""
+    try:
+        return bool(features.check("avif"))
+    except Exception:
+        return False
+
+
+class ImageService:
+    """
+    Downscaled renditions of images, decoded at reduced scale where the codec allows it.
+    """
+
+    @staticmethod
+    def negotiate_format(accept: str, allow_avif: bool = False) -> str:
+        """
+        Pick the output format from the request's Accept header. AVIF is only
+        offered where its slower encode pays off (small, long-cached thumbnails).
+        """
+        accept = accept or ""
+        if allow_avif and "image/avif" in accept and avif_supported():
+            return "avif"
+        if "image/webp" in accept:
+            return "webp"
+        return "jpeg"
+
+    @staticmethod
+    def snap_width(width: int) -> int:
+        for preset in PREVIEW_WIDTHS:
+            if width <= preset:
+                return preset
+        return PREVIEW_WIDTHS[-1]
+
+    @staticmethod
+    def open_scaled(path: str, max_edge: int) -> Image.Image:
+        """
+        Open an image for display at `max_edge` pixels. JPEGs are decoded with
+        draft mode (DCT scaling by 1/2, 1/4 or 1/8), so a 40 MP photo never
+        gets fully decoded just to show 1920px. EXIF orientation is applied.
+        """
+        img = Image.open(path)
+        # draft() only picks a scale that still covers the requested box
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS, reducing_gap=2.0)
+        return img
+
+    @staticmethod
+    def encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+        pil_format = OUTPUT_FORMATS[fmt][0]
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        options = {"quality": quality}
+        if pil_format == "AVIF":
+            options["speed"] = 8  # Encoder effort; default (6) is too slow per request
+        elif pil_format == "WEBP":
+            options["method"] = 4  # Balanced encode speed vs size
+        elif pil_format == "JPEG":
+            options["optimize"] = True
+        buf = io.BytesIO()
+        img.save(buf, format=pil_format, **options)
+        return buf.getvalue()
+
+    @staticmethod
+    def needs_rendition(path: str, width: int) -> bool:
+        """False when the original is already small enough to send as-is."""
+        with Image.open(path) as img:
+            if getattr(img, "is_animated", False):
+                # Keep GIF/WebP animations intact
+                return False
+            orientation = img.getexif().get(0x0112, 1)
+            return max(img.size) > width or orientation not in (1, None)
+
+    @staticmethod
+    def preview(path: str, width: int, fmt: str) -> Tuple[Optional[str], str]:
+        """
+        Return (cached_file, mime_type) for a screen-sized rendition, rendering it
+        on a cache miss. Returns (None, "") when the original should be served instead.
+        """
+        width = ImageService.snap_width(width)
+        if not ImageService.needs_rendition(path, width):
+            return None, ""
+
+        _, mime, ext = OUTPUT_FORMATS[fmt]
+        cache_file = ThumbnailService.cache_path(path, f"preview-{width}-{fmt}", ext, cache="previews")
+        with ThumbnailService.lock_for(cache_file):
+            if os.path.exists(cache_file):
+                cache_hit("preview")
+                ThumbnailService.touch(cache_file)
+                return cache_file, mime
+            cache_miss("preview")
+
+            img = ImageService.open_scaled(path, width)
+            data = ImageService.encode(img, fmt, quality=82)
+            tmp_path = cache_file + ".part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_file)
+        ThumbnailService.enforce_quota("previews", settings.PREVIEW_CACHE_MAX_MB)
+        return cache_file, mime
+
+    @staticmethod
+    def snap_thumbnail_size(size: int) -> int:
+        for preset in THUMBNAIL_SIZES:
+            if size <= preset:
+                return preset
+        return THUMBNAIL_SIZES[-1]
+
+    @staticmethod
+    def thumbnail(path: str, size: int, scale: int, fmt: str) -> Tuple[str, str]:
+        """
+        Return (cached_file, mime_type) for a thumbnail fitting `size` x `scale`
+        pixels, rendering it on a cache miss. Images are opened in draft mode so
+        a JPEG is decoded at the smallest DCT scale that still covers the box.
+        """
+        pixels = ImageService.snap_thumbnail_size(size) * scale
+        _, mime, ext = OUTPUT_FORMATS[fmt]
+        cache_file = ThumbnailService.cache_path(path, f"thumb-{pixels}-{fmt}", ext)
+        with ThumbnailService.lock_for(cache_file):
+            if os.path.exists(cache_file):
+                cache_hit("thumbnail")
+                ThumbnailService.touch(cache_file)
+                return cache_file, mime
+            cache_miss("thumbnail")
+
+            is_video = path.split('.')[-1].lower() in VIDEO_EXTENSIONS
+            started = time.perf_counter()
+            if is_video:
+                img = ThumbnailService.video_frame(path)
+                img.draft("RGB", (pixels, pixels))
+                img.thumbnail((pixels, pixels), Image.LANCZOS, reducing_gap=2.0)
+            else:
+                img = ImageService.open_scaled(path, pixels)
+            data = ImageService.encode(img, fmt, quality=THUMBNAIL_QUALITY[fmt])
+            tmp_path = cache_file + ".part"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_file)
+            THUMBNAIL_SECONDS.observe(time.perf_counter() - started, kind="video" if is_video else "image")
+        ThumbnailService.enforce_quota("thumbs", settings.THUMBNAIL_CACHE_MAX_MB)
+        return cache_file, mime
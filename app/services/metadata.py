@@ -0,0 +1,147 @@
+import os
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from PIL import Image
+from app.core.config import settings
+from app.core.constants import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS
+from app.core.metrics import cache_hit, cache_miss
+from app.utils.formatters import format_timestamp
+
+# EXIF tags
+EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME = 0x0132
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+
+# Listing sort keys backed by extracted metadata (the rest come from stat)
+METADATA_SORT_KEYS = ("taken", "duration", "resolution")
+
+
+def is_media(name: str) -> bool:
+    ext = name.split('.')[-1].lower()
+    return ext in IMAGE_EXTENSIONS or ext in VIDEO_EXTENSIONS or ext in AUDIO_EXTENSIONS
+
+
+class MetadataService:
+    """
+    Media metadata for listings: image dimensions, date taken and camera from
+    the image header/EXIF (no pixel decoding), and duration and codecs for
+    video/audio via ffprobe. Extraction runs on a worker pool and results are
+    cached in CACHE_DIR/metadata.sqlite keyed by (path, size, mtime).
+    """
+
+    _pool = ThreadPoolExecutor(max_workers=max(1, settings.METADATA_WORKERS), thread_name_prefix="metadata")
+    _conn: Optional[sqlite3.Connection] = None
+    _db_lock = threading.Lock()
+
+    @staticmethod
+    def _db() -> sqlite3.Connection:
+        if MetadataService._conn is None:
+            cache_dir = os.path.abspath(settings.CACHE_DIR)
+            os.makedirs(cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(cache_dir, "metadata.sqlite"), timeout=10, check_same_thread=False)
+            # WAL lets other worker processes read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS metadata (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, data TEXT)")
+            MetadataService._conn = conn
+        return MetadataService._conn
+
+    @staticmethod
+    def _parse_exif_date(value) -> Optional[float]:
+        try:
+            return datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S").timestamp()
+        except (ValueError, TypeError):
+            return None
+
+    @staticmethod
+    def _image(path: str) -> Dict[str, Any]:
+        # Image.open only parses the header; pixels are never decoded here
+        with Image.open(path) as img:
+            width, height = img.size
+            exif = img.getexif()
+        meta: Dict[str, Any] = {"width": width, "height": height}
+        if exif.get(TAG_ORIENTATION) in (5, 6, 7, 8):
+            # Rotated 90°: report the dimensions as displayed
+            meta["width"], meta["height"] = height, width
+        taken = MetadataService._parse_exif_date(exif.get_ifd(EXIF_IFD).get(TAG_DATETIME_ORIGINAL))
+        if taken is None:
+            taken = MetadataService._parse_exif_date(exif.get(TAG_DATETIME))
+        if taken is not None:
+            meta["taken_ts"] = taken
+            meta["taken"] = format_timestamp(taken)
+        if exif.get(TAG_MODEL):
+            meta["camera"] = str(exif.get(TAG_MODEL)).strip("\x00 ")
+        return meta
+
+    @staticmethod
+    def _av(path: str) -> Dict[str, Any]:
+        from app.services.transcode import TranscodeService
+
+        info = TranscodeService.probe(path)
+        meta: Dict[str, Any] = {"duration": round(info["duration"], 3)}
+        for key in ("width", "height", "video_codec", "audio_codec"):
+            if info.get(key):
+                meta[key] = info[key]
+        return meta
+
+    @staticmethod
+    def get(path: str) -> Optional[Dict[str, Any]]:
+        """Metadata for one media file, or None if it can't be read (failures aren't cached)."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with MetadataService._db_lock:
+            row = MetadataService._db().execute(
+                "SELECT data FROM metadata WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime)
+            ).fetchone()
+        if row:
+            cache_hit("metadata")
+            return json.loads(row[0])
+        cache_miss("metadata")
+
+        ext = path.split('.')[-1].lower()
+        try:
+            if ext in IMAGE_EXTENSIONS:
+                meta = MetadataService._image(path)
+            elif ext in VIDEO_EXTENSIONS or ext in AUDIO_EXTENSIONS:
+                meta = MetadataService._av(path)
+            else:
+                return None
+        except Exception:
+            return None
+
+        with MetadataService._db_lock:
+            conn = MetadataService._db()
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (path, size, mtime, data) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, json.dumps(meta))
+            )
+            conn.commit()
+        return meta
+
+    @staticmethod
+    def get_many(paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadata for many files, extracted concurrently on the worker pool."""
+        paths = [p for p in paths if is_media(p)]
+        results = MetadataService._pool.map(MetadataService.get, paths)
+        return {path: meta for path, meta in zip(paths, results) if meta is not None}
+
+    @staticmethod
+    def sort_value(meta: Optional[Dict[str, Any]], key: str) -> Optional[float]:
+        if not meta:
+            return None
+        if key == "taken":
+            return meta.get("taken_ts")
+        if key == "duration":
+            return meta.get("duration")
+        if key == "resolution":
+            if meta.get("width") and meta.get("height"):
+                return meta["width"] * meta["height"]
+        return None
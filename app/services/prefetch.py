@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.bandwidth import SCHEDULER, BandwidthScheduler
+from app.core.constants import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+from app.core.metrics import PREFETCH_ITEMS, PREFETCH_JOBS
+from app.core.shared_state import SharedState
+from app.services.drive import DriveService
+from app.services.images import ImageService
+
+logger = logging.getLogger(__name__)
+
+# Current job token per session; replacing or deleting it cancels the running job on any worker
+TOKENS_NAMESPACE = "prefetch_tokens"
+# Thumbnail size/scale/format each session last requested, so prefetched thumbnails hit its cache keys
+PROFILES_NAMESPACE = "prefetch_profiles"
+TOKEN_TTL = 600
+PROFILE_TTL = 86400
+# Visible subfolders scanned per page
+MAX_FOLDERS = 20
+# Sessions whose last thumbnail profile is remembered in-process (least recently used dropped)
+MAX_PROFILES = 256
+# How often a job waiting for foreground requests to finish checks again
+IDLE_POLL = 0.05
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _lower_priority() -> None:
+    """Nice the worker thread (Linux nice is per thread; I/O priority follows it)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class PrefetchService:
+    """
+    Background pre-warming for the page the user is most likely to open next.
+
+    After a listing page is served, one low-priority thread renders thumbnails
+    for the next page (in the size and format the session's thumbnails were
+    last served at) and then scans the page's visible subfolders, which warms
+    the kernel's dentry/inode caches and the metadata cache for a metadata sort.
+
+    Work only happens while no interactive request is in flight, each page gets
+    at most PREFETCH_BUDGET_SECONDS of work, and each item is followed by a
+    pause that keeps the thread at PREFETCH_CPU_SHARE of a core. A session's
+    next listing, or the page being closed, cancels its job between items.
+    """
+
+    _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch", initializer=_lower_priority)
+    # Last profile written per session, to skip redundant SharedState writes
+    _profiles: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+    _profiles_lock = threading.Lock()
+    # Token of each session's job queued or running in this process
+    _active: Dict[str, str] = {}
+
+    @staticmethod
+    def note_thumbnail(request, size: int, scale: int, fmt: str) -> None:
+        """Remember the thumbnail variant a session is rendering its grid with."""
+        client, _ = BandwidthScheduler.client_key(request)
+        profile = (size, scale, fmt)
+        with PrefetchService._profiles_lock:
+            if PrefetchService._profiles.get(client) == profile:
+                PrefetchService._profiles.move_to_end(client)
+                return
+            PrefetchService._profiles[client] = profile
+            PrefetchService._profiles.move_to_end(client)
+            while len(PrefetchService._profiles) > MAX_PROFILES:
+                PrefetchService._profiles.popitem(last=False)
+        SharedState.put(PROFILES_NAMESPACE, client, list(profile), ttl=PROFILE_TTL)
+
+    @staticmethod
+    def schedule(request, path: str, result: Dict[str, Any], sort: str, order: str) -> None:
+        """Queue pre-warming after serving one page of `path`; replaces the session's previous job."""
+        if not settings.PREFETCH_ENABLED or not path:
+            return
+        client, _ = BandwidthScheduler.client_key(request)
+        folders = [item["path"] for item in result["items"] if item["is_dir"]][:MAX_FOLDERS]
+        next_skip = result["skip"] + result["limit"] if result["has_more"] else None
+        if next_skip is None and not folders:
+            # Nothing to warm: only touch SharedState if this process still has a job for the session
+            if client in PrefetchService._active:
+                PrefetchService.cancel(request)
+            return
+        token = uuid.uuid4().hex
+        PrefetchService._active[client] = token
+        SharedState.put(TOKENS_NAMESPACE, client, token, ttl=TOKEN_TTL)
+        PrefetchService._pool.submit(
+            PrefetchService._run, client, token, path, next_skip, result["limit"], sort, order, folders
+        )
+
+    @staticmethod
+    def cancel(request) -> None:
+        client, _ = BandwidthScheduler.client_key(request)
+        SharedState.delete(TOKENS_NAMESPACE, client)
+
+    @staticmethod
+    def _run(client: str, token: str, path: str, next_skip: Optional[int], limit: int,
+             sort: str, order: str, folders: List[str]) -> None:
+        deadline = time.monotonic() + settings.PREFETCH_BUDGET_SECONDS
+        try:
+            if next_skip is not None:
+                profile = SharedState.get(PROFILES_NAMESPACE, client)
+                PrefetchService._step(client, token, deadline)
+                page = DriveService.list_directory(path, skip=next_skip, limit=limit, sort=sort, order=order, raw=True)
+                if profile:
+                    size, scale, fmt = profile
+                    for item in page["items"]:
+                        ext = item["name"].split('.')[-1].lower()
+                        if item["is_dir"] or (ext not in IMAGE_EXTENSIONS and ext not in VIDEO_EXTENSIONS):
+                            continue
+                        PrefetchService._step(client, token, deadline)
+                        PrefetchService._timed("thumbnail", ImageService.thumbnail, item["path"], size, scale, fmt)
+            for folder in folders:
+                PrefetchService._step(client, token, deadline)
+                PrefetchService._timed("folder", DriveService.list_directory, folder,
+                                       limit=limit, sort=sort, order=order, raw=True)
+            PREFETCH_JOBS.inc(result="completed")
+        except _Cancelled as e:
+            PREFETCH_JOBS.inc(result=str(e))
+        except Exception:
+            logger.warning("Prefetch of %s failed", path, exc_info=True)
+            PREFETCH_JOBS.inc(result="failed")
+        finally:
+            if PrefetchService._active.get(client) == token:
+                PrefetchService._active.pop(client, None)
+
+    @staticmethod
+    def _step(client: str, token: str, deadline: float) -> None:
+        """Wait until no interactive request is running; stop if cancelled or over budget."""
+        while True:
+            if SharedState.get(TOKENS_NAMESPACE, client) != token:
+                raise _Cancelled("cancelled")
+            if time.monotonic() > deadline:
+                raise _Cancelled("budget")
+            if not SCHEDULER.interactive_busy():
+                return
+            time.sleep(IDLE_POLL)
+
+    @staticmethod
+    def _timed(kind: str, fn, *args, **kwargs) -> None:
+        started = time.perf_counter()
+        try:
+            fn(*args, **kwargs)
+            PREFETCH_ITEMS.inc(kind=kind)
+        except Exception:
+            # Unreadable files and folders are simply skipped; the foreground request reports them
+            pass
+        elapsed = time.perf_counter() - started
+        share = min(1.0, max(0.01, settings.PREFETCH_CPU_SHARE))
+        time.sleep(elapsed * (1 - share) / share)
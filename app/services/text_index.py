@@ -0,0 +1,271 @@
+import os
+import json
+import asyncio
+import bisect
+import hashlib
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import cache_hit, cache_miss
+from app.core.shared_state import SharedLock, lock_for
+
+# The index stores the newline count at every block boundary, so finding a
+# line means one bisect plus scanning at most one block.
+INDEX_BLOCK = 64 * 1024
+READ_CHUNK = 1024 * 1024
+# Bytes before the indexed end that must be unchanged for a file to count as appended-to
+FINGERPRINT_BYTES = 4096
+# Longest line (in characters) returned to the browser; the rest is elided
+MAX_LINE_CHARS = 10000
+# Bytes of one line buffered at most (4 per UTF-8 character, plus one so the cut is flagged);
+# past that the rest of the line is skipped via the index
+MAX_LINE_BYTES = MAX_LINE_CHARS * 4 + 4
+
+
+class TextIndexService:
+    """
+    Sparse line-offset index for large text files (logs, CSV, JSON).
+
+    Indexes are kept in memory and persisted under CACHE_DIR/lines, keyed by
+    path and validated by size/mtime. When a file only grew (the bytes before
+    the previously indexed end are unchanged), indexing resumes where it left
+    off instead of rescanning the whole file.
+    """
+
+    _indexes: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _lock_for(path: str) -> SharedLock:
+        return lock_for("text-index|" + path)
+
+    @staticmethod
+    def _index_file(path: str) -> str:
+        digest = hashlib.sha1(path.encode("utf-8")).hexdigest()
+        cache_dir = os.path.join(os.path.abspath(settings.CACHE_DIR), "lines", digest[:2])
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, f"{digest}.json")
+
+    @staticmethod
+    def _fingerprint(f, end: int) -> str:
+        start = max(0, end - FINGERPRINT_BYTES)
+        f.seek(start)
+        return hashlib.sha1(f.read(end - start)).hexdigest()
+
+    @staticmethod
+    def _load(path: str) -> Optional[Dict[str, Any]]:
+        index = TextIndexService._indexes.get(path)
+        if index is not None:
+            return index
+        try:
+            with open(TextIndexService._index_file(path), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return index if index.get("block") == INDEX_BLOCK else None
+
+    @staticmethod
+    def _save(path: str, index: Dict[str, Any]) -> None:
+        if len(TextIndexService._indexes) > 256:
+            TextIndexService._indexes.clear()
+        TextIndexService._indexes[path] = index
+        target = TextIndexService._index_file(path)
+        tmp_path = target + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, target)
+
+    @staticmethod
+    def _extend(f, index: Dict[str, Any], size: int) -> None:
+        """Scan bytes [scanned, size), recording the newline count at each block boundary."""
+        pos = index["scanned"]
+        newlines = index["newlines"]
+        counts = index["counts"]
+        f.seek(pos)
+        while pos < size:
+            chunk = f.read(min(READ_CHUNK, size - pos))
+            if not chunk:
+                break
+            # Boundaries falling inside this chunk
+            boundary = len(counts) * INDEX_BLOCK
+            last = 0
+            while boundary <= pos + len(chunk):
+                cut = boundary - pos
+                newlines += chunk.count(b"\n", last, cut)
+                last = cut
+                counts.append(newlines)
+                boundary += INDEX_BLOCK
+            newlines += chunk.count(b"\n", last)
+            pos += len(chunk)
+            index["ends_with_newline"] = chunk.endswith(b"\n")
+        index["scanned"] = pos
+        index["newlines"] = newlines
+
+    @staticmethod
+    def index(path: str) -> Dict[str, Any]:
+        """
+        Return the up-to-date index for `path`, building or extending it as needed.
+        """
+        with TextIndexService._lock_for(path):
+            stat = os.stat(path)
+            index = TextIndexService._load(path)
+            if index is not None and index["size"] == stat.st_size and index["mtime"] == stat.st_mtime:
+                cache_hit("text_index")
+                TextIndexService._indexes[path] = index
+                return index
+            cache_miss("text_index")
+
+            with open(path, "rb") as f:
+                appended = (
+                    index is not None
+                    and stat.st_size >= index["scanned"]
+                    and TextIndexService._fingerprint(f, index["scanned"]) == index["fingerprint"]
+                )
+                if not appended:
+                    # New, truncated or rewritten file: start over
+                    index = {
+                        "block": INDEX_BLOCK,
+                        "counts": [0],
+                        "scanned": 0,
+                        "newlines": 0,
+                        "ends_with_newline": True,
+                    }
+                TextIndexService._extend(f, index, stat.st_size)
+                index["fingerprint"] = TextIndexService._fingerprint(f, index["scanned"])
+            index["size"] = stat.st_size
+            index["mtime"] = stat.st_mtime
+            TextIndexService._save(path, index)
+            return index
+
+    @staticmethod
+    def total_lines(index: Dict[str, Any]) -> int:
+        # A trailing line without a newline still counts as a line
+        if index["scanned"] == 0:
+            return 0
+        return index["newlines"] + (0 if index["ends_with_newline"] else 1)
+
+    @staticmethod
+    def line_offset(f, index: Dict[str, Any], line: int) -> int:
+        """Byte offset where `line` (0-based) starts: bisect to its block, then skip within it."""
+        if line <= 0:
+            return 0
+        counts = index["counts"]
+        # Last boundary with fewer than `line` newlines before it
+        block = bisect.bisect_left(counts, line) - 1
+        pos = block * INDEX_BLOCK
+        remaining = line - counts[block]
+        f.seek(pos)
+        while True:
+            chunk = f.read(INDEX_BLOCK)
+            if not chunk:
+                return pos
+            parts = chunk.split(b"\n", remaining)
+            if len(parts) > remaining:
+                return pos + len(chunk) - len(parts[-1])
+            remaining -= len(parts) - 1
+            pos += len(chunk)
+
+    @staticmethod
+    def decode_line(raw: bytes) -> str:
+        text = raw.rstrip(b"\r").decode("utf-8", errors="replace")
+        if len(text) > MAX_LINE_CHARS:
+            text = text[:MAX_LINE_CHARS] + " …"
+        return text
+
+    @staticmethod
+    def read_lines(path: str, start: int, count: int) -> Dict[str, Any]:
+        """
+        Return `count` lines starting at line `start`, plus the totals and the
+        byte offset of the last complete line so the client can follow the tail.
+        """
+        index = TextIndexService.index(path)
+        total = TextIndexService.total_lines(index)
+        start = max(0, min(start, total))
+        lines: List[str] = []
+        with open(path, "rb") as f:
+            pos = TextIndexService.line_offset(f, index, start)
+            f.seek(pos)
+            buffer = b""
+            while len(lines) < count and pos < index["size"]:
+                chunk = f.read(min(INDEX_BLOCK, index["size"] - pos))
+                if not chunk:
+                    break
+                pos += len(chunk)
+                buffer += chunk
+                parts = buffer.split(b"\n")
+                buffer = parts.pop()
+                lines.extend(TextIndexService.decode_line(p) for p in parts[:count - len(lines)])
+                if len(buffer) > MAX_LINE_BYTES and len(lines) < count:
+                    # Keep the head of an overlong line and jump straight to the next one
+                    lines.append(TextIndexService.decode_line(buffer[:MAX_LINE_BYTES]))
+                    buffer = b""
+                    following = start + len(lines)
+                    if following > index["newlines"]:
+                        break
+                    pos = TextIndexService.line_offset(f, index, following)
+                    f.seek(pos)
+            if buffer and len(lines) < count:
+                lines.append(TextIndexService.decode_line(buffer))
+
+            tail_line, tail_offset = TextIndexService.tail_position(f, index)
+        return {
+            "start": start,
+            "lines": lines,
+            "total_lines": total,
+            "size": index["size"],
+            "tail_line": tail_line,
+            "tail_offset": tail_offset,
+        }
+
+    @staticmethod
+    def tail_position(f, index: Dict[str, Any]) -> Tuple[int, int]:
+        """(line, offset) of the first incomplete line, where a live tail resumes."""
+        line = index["newlines"]
+        return line, TextIndexService.line_offset(f, index, line)
+
+    @staticmethod
+    def _read_at(path: str, position: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(position)
+            return f.read(length)
+
+    @staticmethod
+    async def follow(path: str, offset: int, line: int, is_disconnected) -> AsyncIterator[str]:
+        """
+        `tail -f` as Server-Sent Events: poll the file and emit each newly completed
+        line as `{"line": n, "text": ...}`. A `reset` event is sent if the file shrinks
+        (truncated or rotated), after which the client should reload.
+        """
+        poll = settings.TEXT_TAIL_POLL_SECONDS
+        idle = 0.0
+        pending = b""
+        yield "retry: 3000\n\n"
+        while not await is_disconnected():
+            try:
+                size = await asyncio.to_thread(os.path.getsize, path)
+            except FileNotFoundError:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            if size < offset + len(pending):
+                yield "event: reset\ndata: {}\n\n"
+                return
+
+            if size > offset + len(pending):
+                # File I/O runs in a worker thread: a slow disk or network share must not stall the event loop
+                pending += await asyncio.to_thread(
+                    TextIndexService._read_at, path, offset + len(pending), min(READ_CHUNK, size - offset - len(pending))
+                )
+                parts = pending.split(b"\n")
+                pending = parts.pop()
+                for raw in parts:
+                    payload = json.dumps({"line": line, "text": TextIndexService.decode_line(raw)})
+                    yield f"data: {payload}\n\n"
+                    offset += len(raw) + 1
+                    line += 1
+                idle = 0.0
+                if size > offset + len(pending):
+                    # More than one chunk behind: keep reading without sleeping
+                    continue
+            elif idle >= 15:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(poll)
+            idle += poll
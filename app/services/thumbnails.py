@@ -0,0 +1,215 @@
+import os
+import io
+import json
+import time
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple
+from PIL import Image
+from app.core.config import settings
+from app.core.metrics import FFMPEG_FAILURES, cache_hit, cache_miss
+from app.core.shared_state import SharedLock, lock_for
+from app.services.transcode import TranscodeService
+
+# Width of one frame in a hover-scrub sprite strip
+SPRITE_TILE_WIDTH = 160
+# Walking a large cache is expensive: sweep each cache at most this often
+QUOTA_SWEEP_SECONDS = 60
+# Cache hits refresh a file's mtime (its LRU timestamp) at most this often
+TOUCH_SECONDS = 3600
+
+
+class ThumbnailService:
+    """
+    Video frame grabs and hover-scrub sprite strips, cached on disk under CACHE_DIR/thumbs,
+    plus the shared cache helpers (paths, LRU touch, quota sweeps) for image renditions.
+    """
+
+    _sweeper = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-sweep")
+    _last_sweep: Dict[str, float] = {}
+    _sweep_lock = threading.Lock()
+
+    @staticmethod
+    def cache_path(path: str, variant: str, ext: str, cache: str = "thumbs") -> str:
+        """
+        Cache file for a rendition of `path` under CACHE_DIR/<cache>. Keyed by size
+        and mtime, so edits invalidate it.
+        """
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{path}|{stat.st_size}|{stat.st_mtime}|{variant}".encode("utf-8")).hexdigest()
+        cache_dir = os.path.join(os.path.abspath(settings.CACHE_DIR), cache, digest[:2])
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, f"{digest}.{ext}")
+
+    @staticmethod
+    def touch(cache_file: str) -> None:
+        """Mark a cache hit as recently used for eviction (rate-limited to spare metadata writes)."""
+        try:
+            if os.stat(cache_file).st_mtime < time.time() - TOUCH_SECONDS:
+                os.utime(cache_file)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def enforce_quota(cache: str, limit_mb: int) -> None:
+        """
+        Schedule a background sweep deleting least recently used files of
+        CACHE_DIR/<cache> until it fits `limit_mb`. Runs at most every QUOTA_SWEEP_SECONDS.
+        """
+        now = time.monotonic()
+        with ThumbnailService._sweep_lock:
+            if now - ThumbnailService._last_sweep.get(cache, -QUOTA_SWEEP_SECONDS) < QUOTA_SWEEP_SECONDS:
+                return
+            ThumbnailService._last_sweep[cache] = now
+        ThumbnailService._sweeper.submit(ThumbnailService._sweep, cache, limit_mb * 1024 * 1024)
+
+    @staticmethod
+    def _sweep(cache: str, limit: int) -> None:
+        files = []
+        total = 0
+        for dirpath, _, filenames in os.walk(os.path.join(os.path.abspath(settings.CACHE_DIR), cache)):
+            for name in filenames:
+                if name.endswith(".part"):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, full))
+                total += st.st_size
+        if total <= limit:
+            return
+        files.sort()
+        for _, size, full in files:
+            if total <= limit:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def lock_for(key: str) -> SharedLock:
+        # Held across worker processes, so each rendition is generated once
+        return lock_for(key)
+
+    @staticmethod
+    def _duration(path: str) -> float:
+        try:
+            return TranscodeService.probe(path)["duration"]
+        except Exception:
+            return 0.0
+
+    @staticmethod
+    def video_frame(path: str) -> Image.Image:
+        """
+        Grab a representative frame using an input-side keyframe seek to
+        VIDEO_THUMBNAIL_OFFSET_PERCENT of the duration, skipping black intros
+        without decoding from the start of the file.
+        """
+        offset = ThumbnailService._duration(path) * settings.VIDEO_THUMBNAIL_OFFSET_PERCENT / 100.0
+        cmd = [
+            "ffmpeg", "-v", "error",
+            "-skip_frame", "nokey",  # Only decode keyframes
+            "-noaccurate_seek",
+            "-ss", f"{offset:.3f}",
+            "-i", path,
+            "-frames:v", "1",
+            "-f", "image2pipe",
+            "-vcodec", "mjpeg",
+            "-"
+        ]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=5)
+        except subprocess.TimeoutExpired:
+            FFMPEG_FAILURES.inc(operation="thumbnail")
+            raise RuntimeError("Timed out reading video frame")
+        if result.returncode != 0 or not result.stdout:
+            FFMPEG_FAILURES.inc(operation="thumbnail")
+            raise RuntimeError("Failed to read video frame")
+        return Image.open(io.BytesIO(result.stdout))
+
+    @staticmethod
+    def sprite(path: str, frames: int) -> Tuple[str, Dict[str, Any]]:
+        """
+        Return (jpeg_path, timing_map) for a strip of `frames` evenly spaced frames,
+        rendered in a single ffmpeg pass and cached.
+        """
+        variant = f"sprite-{frames}"
+        sprite_path = ThumbnailService.cache_path(path, variant, "jpg")
+        map_path = ThumbnailService.cache_path(path, variant, "json")
+
+        with ThumbnailService.lock_for(sprite_path):
+            if os.path.exists(sprite_path) and os.path.exists(map_path):
+                cache_hit("sprite")
+                ThumbnailService.touch(sprite_path)
+                ThumbnailService.touch(map_path)
+                with open(map_path, "r", encoding="utf-8") as f:
+                    return sprite_path, json.load(f)
+            cache_miss("sprite")
+
+            duration = ThumbnailService._duration(path)
+            if duration <= 0:
+                raise RuntimeError("Video duration is unknown")
+            interval = duration / frames
+
+            tmp_path = sprite_path + ".part"
+            cmd = [
+                "ffmpeg", "-y", "-v", "error",
+                "-skip_frame", "nokey",
+                "-i", path,
+                "-vf", f"fps={frames}/{duration:.3f},scale={SPRITE_TILE_WIDTH}:-2,tile={frames}x1",
+                "-frames:v", "1",
+                "-q:v", "5",
+                "-f", "image2",
+                "-vcodec", "mjpeg",
+                tmp_path
+            ]
+            try:
+                result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=60)
+            except subprocess.TimeoutExpired:
+                FFMPEG_FAILURES.inc(operation="sprite")
+                raise RuntimeError("Timed out generating sprite")
+            if result.returncode != 0 or not os.path.exists(tmp_path):
+                FFMPEG_FAILURES.inc(operation="sprite")
+                raise RuntimeError("Failed to generate sprite")
+
+            with Image.open(tmp_path) as img:
+                width, height = img.size
+
+            timing = {
+                "frames": frames,
+                "duration": duration,
+                "interval": interval,
+                "tile_width": width // frames,
+                "tile_height": height,
+                "times": [round(i * interval, 3) for i in range(frames)],
+            }
+            os.replace(tmp_path, sprite_path)
+            with open(map_path, "w", encoding="utf-8") as f:
+                json.dump(timing, f)
+        ThumbnailService.enforce_quota("thumbs", settings.THUMBNAIL_CACHE_MAX_MB)
+        return sprite_path, timing
+
+    @staticmethod
+    def sprite_vtt(timing: Dict[str, Any], sprite_url: str) -> str:
+        """
+        WebVTT track mapping time ranges to sprite tiles (Plyr `previewThumbnails` format).
+        """
+        def ts(seconds: float) -> str:
+            hours, rem = divmod(seconds, 3600)
+            minutes, secs = divmod(rem, 60)
+            return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+        lines = ["WEBVTT", ""]
+        w, h = timing["tile_width"], timing["tile_height"]
+        for i, start in enumerate(timing["times"]):
+            end = timing["times"][i + 1] if i + 1 < len(timing["times"]) else timing["duration"]
+            lines.append(f"{ts(start)} --> {ts(end)}")
+            lines.append(f"{sprite_url}#xywh={i * w},0,{w},{h}")
+            lines.append("")
+        return "\n".join(lines)
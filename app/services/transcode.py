@@ -0,0 +1,383 @@
+import os
+import json
+import math
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+from app.core.config import settings
+from app.core.metrics import FFMPEG_FAILURES, TRANSCODE_SECONDS, cache_hit, cache_miss
+from app.core.shared_state import SharedState, SharedLock, lock_for
+
+# Codecs every mainstream browser decodes inside MP4/WebM
+BROWSER_VIDEO_CODECS = {"h264", "vp8", "vp9", "av1"}
+BROWSER_AUDIO_CODECS = {"aac", "mp3", "opus", "vorbis", "flac"}
+# Containers the browser can open directly from /view
+NATIVE_CONTAINERS = {"mp4", "webm", "ogg"}
+# Remux cut points: the first keyframe at or after each nominal boundary, per (path, size, mtime, time)
+KEYFRAMES_NAMESPACE = "hls_keyframes"
+# Seconds of packets one keyframe lookup reads; ffprobe seeks straight to the window
+KEYFRAME_SCAN_SECONDS = 10
+# Nudge for stream-copy cuts: seek just past the boundary keyframe so rounding never
+# lands on the previous one, and stop just before the next boundary keyframe
+KEYFRAME_EPSILON = 0.001
+
+
+class TranscodeService:
+    """
+    Decides how a video reaches the browser and produces HLS segments on demand.
+
+    - direct:    native container and codecs, stream the file from /view.
+    - remux:     compatible codecs in a foreign container (mkv/avi/mov), copy
+                 the streams into MPEG-TS / fragmented MP4 without re-encoding.
+    - transcode: re-encode to H.264/AAC.
+
+    Segments are only generated when requested (plus one lookahead) and are
+    cached under CACHE_DIR/hls, evicted oldest-first beyond TRANSCODE_CACHE_MAX_MB.
+    The playlist lists a segment every HLS_SEGMENT_SECONDS. Transcoded segments
+    are cut exactly there (each encode starts on a fresh keyframe). Stream copy
+    can only cut on existing keyframes, so a remux segment runs from the first
+    keyframe at or after its nominal start to the first one at or after the
+    next; those keyframes are looked up per segment, reading only a few seconds
+    of the file, so playback never waits for a whole-file scan.
+    """
+
+    _probe_cache: Dict[tuple, Dict[str, Any]] = {}
+    _lookahead = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hls-lookahead")
+
+    @staticmethod
+    def _cache_root() -> str:
+        root = os.path.join(os.path.abspath(settings.CACHE_DIR), "hls")
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    @staticmethod
+    def probe(path: str) -> Dict[str, Any]:
+        """
+        Read duration and primary stream codecs with ffprobe, cached by (path, size, mtime).
+        """
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime)
+        cached = TranscodeService._probe_cache.get(key)
+        if cached is None:
+            # Another worker process may already have probed it
+            cached = SharedState.get("probe", f"{path}|{stat.st_size}|{stat.st_mtime}")
+            if cached is not None:
+                TranscodeService._probe_cache[key] = cached
+        if cached is not None:
+            cache_hit("probe")
+            return cached
+        cache_miss("probe")
+
+        cmd = [
+            "ffprobe", "-v", "error",
+            "-print_format", "json",
+            "-show_format", "-show_streams",
+            path
+        ]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15)
+        except subprocess.TimeoutExpired:
+            FFMPEG_FAILURES.inc(operation="probe")
+            raise RuntimeError("ffprobe timed out")
+        if result.returncode != 0:
+            FFMPEG_FAILURES.inc(operation="probe")
+            raise RuntimeError("ffprobe could not read this file")
+
+        data = json.loads(result.stdout or b"{}")
+        info = {"duration": 0.0, "start_time": 0.0, "video_codec": None, "audio_codec": None, "width": None, "height": None}
+        try:
+            info["duration"] = float(data.get("format", {}).get("duration") or 0)
+            info["start_time"] = float(data.get("format", {}).get("start_time") or 0)
+        except ValueError:
+            pass
+        for stream in data.get("streams", []):
+            if stream.get("codec_type") == "video" and info["video_codec"] is None:
+                # Skip embedded cover art, which ffprobe reports as a video stream
+                if stream.get("disposition", {}).get("attached_pic"):
+                    continue
+                info["video_codec"] = stream.get("codec_name")
+                info["width"] = stream.get("width")
+                info["height"] = stream.get("height")
+            elif stream.get("codec_type") == "audio" and info["audio_codec"] is None:
+                info["audio_codec"] = stream.get("codec_name")
+
+        if len(TranscodeService._probe_cache) > 1024:
+            TranscodeService._probe_cache.clear()
+        TranscodeService._probe_cache[key] = info
+        SharedState.put("probe", f"{path}|{stat.st_size}|{stat.st_mtime}", info, ttl=7 * 86400)
+        return info
+
+    @staticmethod
+    def playback_plan(path: str) -> Dict[str, Any]:
+        """
+        Probe a video and decide whether it can be played directly, remuxed or must be transcoded.
+        """
+        info = TranscodeService.probe(path)
+        ext = path.split('.')[-1].lower()
+        video_ok = info["video_codec"] in BROWSER_VIDEO_CODECS
+        audio_ok = info["audio_codec"] is None or info["audio_codec"] in BROWSER_AUDIO_CODECS
+
+        if video_ok and audio_ok and ext in NATIVE_CONTAINERS:
+            mode = "direct"
+        elif info["video_codec"] == "h264" and audio_ok:
+            # H.264 can be copied into MPEG-TS/fMP4 as-is
+            mode = "remux"
+        else:
+            mode = "transcode"
+
+        return {
+            "mode": mode,
+            "duration": info["duration"],
+            "video_codec": info["video_codec"],
+            "audio_codec": info["audio_codec"],
+            "width": info["width"],
+            "height": info["height"],
+            "segment_seconds": settings.HLS_SEGMENT_SECONDS,
+        }
+
+    @staticmethod
+    def _codec_args(plan: Dict[str, Any]) -> list:
+        if plan["mode"] == "transcode":
+            video = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p"]
+        else:
+            video = ["-c:v", "copy"]
+        if plan["audio_codec"] == "aac":
+            audio = ["-c:a", "copy"]
+        else:
+            audio = ["-c:a", "aac", "-b:a", "160k", "-ac", "2"]
+        return video + audio
+
+    @staticmethod
+    def playlist(path: str) -> str:
+        """
+        Build a VOD HLS playlist whose segments are rendered lazily by `segment()`.
+        """
+        segments = TranscodeService.nominal_segments(TranscodeService.playback_plan(path))
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+            f"#EXT-X-TARGETDURATION:{settings.HLS_SEGMENT_SECONDS}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        quoted = quote(path, safe="")
+        for index, (_, length) in enumerate(segments):
+            lines.append(f"#EXTINF:{length:.3f},")
+            lines.append(f"segment?path={quoted}&index={index}")
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def nominal_segments(plan: Dict[str, Any]) -> List[Tuple[float, float]]:
+        """(start, length) of every HLS segment as listed in the playlist."""
+        seg = settings.HLS_SEGMENT_SECONDS
+        duration = plan["duration"]
+        if duration <= 0:
+            raise RuntimeError("Video duration is unknown")
+        return [(i * seg, min(seg, duration - i * seg)) for i in range(math.ceil(duration / seg))]
+
+    @staticmethod
+    def _segment_bounds(path: str, plan: Dict[str, Any], index: int) -> Tuple[float, float]:
+        """(start, length) segment `index` is actually cut at."""
+        segments = TranscodeService.nominal_segments(plan)
+        if index < 0 or index >= len(segments):
+            raise IndexError("Segment out of range")
+        start, length = segments[index]
+        if plan["mode"] != "remux":
+            return start, length
+        end = start + length
+        if index > 0:
+            start = TranscodeService.keyframe_after(path, start)
+        if index + 1 < len(segments):
+            end = TranscodeService.keyframe_after(path, end)
+        # A GOP longer than a segment leaves no keyframe inside it: the segment is then (nearly) empty
+        return start, max(end - start, 0.0)
+
+    @staticmethod
+    def keyframe_after(path: str, time: float) -> float:
+        """First keyframe at or after `time` (the duration if there is none), cached across workers."""
+        stat = os.stat(path)
+        key = f"{path}|{stat.st_size}|{stat.st_mtime}|{time:.3f}"
+        cached = SharedState.get(KEYFRAMES_NAMESPACE, key)
+        if cached is not None:
+            cache_hit("hls_keyframe")
+            return cached
+        cache_miss("hls_keyframe")
+
+        duration = TranscodeService.probe(path)["duration"]
+        found = duration
+        window = time
+        while window < duration:
+            later = [t for t in TranscodeService._keyframes(path, window, window + KEYFRAME_SCAN_SECONDS) if t >= time - KEYFRAME_EPSILON]
+            if later:
+                found = min(later[0], duration)
+                break
+            window += KEYFRAME_SCAN_SECONDS
+        SharedState.put(KEYFRAMES_NAMESPACE, key, found, ttl=7 * 86400)
+        return found
+
+    @staticmethod
+    def keyframe_before(path: str, time: float) -> float:
+        """Last keyframe at or before `time`: where a stream copy started at `time` really begins."""
+        if time <= 0:
+            return 0.0
+        earlier = [t for t in TranscodeService._keyframes(path, time, time + 1) if t <= time]
+        return earlier[-1] if earlier else 0.0
+
+    @staticmethod
+    def _keyframes(path: str, start: float, end: float) -> List[float]:
+        """
+        Keyframe times of the first video stream from the keyframe at or before
+        `start` up to `end`, relative to the file's start (the origin `-ss` seeks
+        from). ffprobe seeks to the window and reads packet flags, without decoding.
+        """
+        origin = TranscodeService.probe(path).get("start_time", 0.0)
+        cmd = [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-read_intervals", f"{start + origin:.6f}%{end + origin:.6f}",
+            "-show_entries", "packet=pts_time,flags",
+            "-print_format", "json",
+            path
+        ]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15)
+        except subprocess.TimeoutExpired:
+            FFMPEG_FAILURES.inc(operation="probe")
+            raise RuntimeError("ffprobe timed out reading keyframes")
+        if result.returncode != 0:
+            FFMPEG_FAILURES.inc(operation="probe")
+            raise RuntimeError("ffprobe could not read keyframes")
+
+        times = []
+        for packet in json.loads(result.stdout or b"{}").get("packets", []):
+            if "K" not in packet.get("flags", ""):
+                continue
+            try:
+                times.append(float(packet["pts_time"]) - origin)
+            except (KeyError, ValueError):
+                continue
+        return sorted(times)
+
+    @staticmethod
+    def _segment_dir(path: str) -> str:
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{path}|{stat.st_size}|{stat.st_mtime}".encode("utf-8")).hexdigest()
+        seg_dir = os.path.join(TranscodeService._cache_root(), digest)
+        os.makedirs(seg_dir, exist_ok=True)
+        return seg_dir
+
+    @staticmethod
+    def _lock_for(key: str) -> SharedLock:
+        return lock_for(key)
+
+    @staticmethod
+    def segment(path: str, index: int, lookahead: bool = True) -> str:
+        """
+        Return the path of MPEG-TS segment `index`, rendering it with ffmpeg if it isn't cached.
+        """
+        plan = TranscodeService.playback_plan(path)
+        start, length = TranscodeService._segment_bounds(path, plan, index)
+
+        # Boundaries depend on the mode and the segment length, so both are part of the name
+        seg_name = f"{plan['mode']}-{settings.HLS_SEGMENT_SECONDS}s-{index:05d}.ts"
+        seg_path = os.path.join(TranscodeService._segment_dir(path), seg_name)
+        rendered = False
+        with TranscodeService._lock_for(seg_path):
+            if os.path.exists(seg_path):
+                cache_hit("hls_segment")
+                os.utime(seg_path)  # Mark as recently used for eviction
+            else:
+                cache_miss("hls_segment")
+                TranscodeService._render_segment(path, plan, start, length, seg_path)
+                rendered = True
+
+        if rendered:
+            TranscodeService._enforce_quota()
+
+        # Warm the next segment so sequential playback never waits on ffmpeg
+        if lookahead and index + 1 < len(TranscodeService.nominal_segments(plan)):
+            TranscodeService._lookahead.submit(TranscodeService._warm, path, index + 1)
+        return seg_path
+
+    @staticmethod
+    def _warm(path: str, index: int) -> None:
+        try:
+            TranscodeService.segment(path, index, lookahead=False)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _render_segment(path: str, plan: Dict[str, Any], start: float, length: float, seg_path: str) -> None:
+        tmp_path = seg_path + ".part"
+        seek, duration = start, length
+        if plan["mode"] == "remux" and start > 0:
+            # `start` is a keyframe: land exactly on it and stop before the next boundary keyframe
+            seek, duration = start + KEYFRAME_EPSILON, max(length - 2 * KEYFRAME_EPSILON, KEYFRAME_EPSILON)
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-ss", f"{seek:.6f}",  # Input-side seek: jumps to the nearest keyframe before it
+            "-i", path,
+            "-t", f"{duration:.6f}",
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *TranscodeService._codec_args(plan),
+            "-output_ts_offset", f"{start:.6f}",
+            "-f", "mpegts",
+            tmp_path
+        ]
+        with TRANSCODE_SECONDS.time(mode=plan["mode"]):
+            try:
+                result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=120)
+            except subprocess.TimeoutExpired:
+                FFMPEG_FAILURES.inc(operation="transcode")
+                raise RuntimeError("Segment generation timed out")
+        if result.returncode != 0 or not os.path.exists(tmp_path):
+            FFMPEG_FAILURES.inc(operation="transcode")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError("Failed to generate video segment")
+        os.replace(tmp_path, seg_path)
+
+    @staticmethod
+    def _enforce_quota() -> None:
+        """Evict least recently used segments beyond TRANSCODE_CACHE_MAX_MB, in the background."""
+        from app.services.thumbnails import ThumbnailService  # thumbnails imports this module
+        ThumbnailService.enforce_quota("hls", settings.TRANSCODE_CACHE_MAX_MB)
+
+    @staticmethod
+    def stream_fmp4(path: str, start: float = 0.0) -> Iterator[bytes]:
+        """
+        Stream the video as fragmented MP4 straight from ffmpeg's stdout, for
+        browsers without native HLS. Playback can begin after the first fragment.
+        Remuxed streams start at the keyframe at or before `start`; clients look it
+        up with `keyframe_before()` (/stream/keyframe) to know where the stream begins.
+        """
+        plan = TranscodeService.playback_plan(path)
+        start = max(start, 0.0)
+        if plan["mode"] == "remux" and start > 0:
+            start = TranscodeService.keyframe_before(path, start)
+            if start > 0:
+                start += KEYFRAME_EPSILON
+        cmd = [
+            "ffmpeg", "-v", "error",
+            "-ss", f"{start:.6f}",
+            "-i", path,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *TranscodeService._codec_args(plan),
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            "-f", "mp4",
+            "pipe:1"
+        ]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while chunk := proc.stdout.read(65536):
+                yield chunk
+        finally:
+            # Client went away or stream finished: never leave ffmpeg running
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            if proc.returncode not in (0, -9):
+                FFMPEG_FAILURES.inc(operation="transcode")
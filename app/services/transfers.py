@@ -0,0 +1,389 @@
+import os
+import errno
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import settings
+from app.core.shared_state import SharedState
+from app.utils.security import validate_path
+
+CONFLICT_POLICIES = ("skip", "overwrite", "rename")
+# Files below this are copied concurrently on the worker pool; larger ones one at a time
+SMALL_FILE_BYTES = 1024 * 1024
+# Bytes per copy_file_range/sendfile call; pause/cancel are checked between calls
+COPY_CHUNK = 8 * 1024 * 1024
+MAX_REPORTED_ERRORS = 100
+# Progress mirrored to SharedState, as for duplicate scans
+JOBS_NAMESPACE = "transfer_jobs"
+CONTROL_NAMESPACE = "transfer_control"
+PUBLISH_INTERVAL = 1.0
+RUNNING_TTL = 30
+FINISHED_TTL = 86400
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _unique_name(target: str) -> str:
+    """`name_1.ext`, `name_2.ext`, ... (the same scheme archive extraction uses)."""
+    stem, ext = os.path.splitext(target)
+    if os.path.isdir(target):
+        stem, ext = target, ""
+    counter = 1
+    while True:
+        candidate = f"{stem}_{counter}{ext}"
+        if not os.path.lexists(candidate):
+            return candidate
+        counter += 1
+
+
+def _copy_data(src_fd: int, dst_fd: int, size: int, on_chunk) -> int:
+    """
+    Copy up to `size` bytes between file descriptors inside the kernel:
+    copy_file_range (which can reflink or offload on some filesystems), then
+    sendfile, then a plain read/write loop where neither is supported.
+    Returns the number of bytes copied.
+    """
+    methods = [m for m in ("copy_file_range", "sendfile") if hasattr(os, m)] + ["readwrite"]
+    method = methods.pop(0)
+    offset = 0
+    while offset < size:
+        count = min(COPY_CHUNK, size - offset)
+        try:
+            if method == "copy_file_range":
+                sent = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+            elif method == "sendfile":
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                sent = os.sendfile(dst_fd, src_fd, offset, count)
+            else:
+                os.lseek(src_fd, offset, os.SEEK_SET)
+                data = os.read(src_fd, count)
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                sent = os.write(dst_fd, data)
+        except OSError as e:
+            if methods and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                # Not supported for this pair of files: fall back to the next method
+                method = methods.pop(0)
+                continue
+            raise
+        if sent == 0:
+            break  # Source shrank while copying
+        offset += sent
+        on_chunk(sent)
+    return offset
+
+
+class TransferService:
+    """
+    Server-side copy and move jobs between folders and drives.
+
+    Moves within one filesystem are renames. Everything else is copied with
+    kernel-side primitives (copy_file_range/sendfile), so file data never passes
+    through Python. Small files are copied concurrently on a thread pool to keep
+    the disks busy with many in-flight requests; large files are streamed one at
+    a time. Each file is written to a hidden temp name and renamed into place,
+    so cancelled or failed copies never leave truncated files behind. Moves only
+    delete a source file after its copy has been completed.
+
+    Conflict policies for existing targets: skip, overwrite, or rename (name_1.ext).
+    Folders are merged into existing folders under skip/overwrite.
+    """
+
+    _jobs: Dict[str, Dict[str, Any]] = {}
+    _jobs_lock = threading.Lock()
+
+    @staticmethod
+    def start(op: str, sources: List[str], dest: str, conflict: str) -> Dict[str, Any]:
+        """Validate the request and start a background copy/move job."""
+        dest = os.path.abspath(dest)
+        validate_path(dest)
+        if not os.path.isdir(dest):
+            raise NotADirectoryError(f"Destination is not a folder: {dest}")
+        resolved = []
+        for source in sources:
+            source = os.path.abspath(source)
+            validate_path(source)
+            if not os.path.lexists(source):
+                raise FileNotFoundError(f"Not found: {source}")
+            if os.path.isdir(source) and (dest == source or dest.startswith(source.rstrip(os.sep) + os.sep)):
+                raise ValueError(f"Cannot {op} a folder into itself: {source}")
+            resolved.append(source)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "op": op,
+            "sources": resolved,
+            "dest": dest,
+            "conflict": conflict,
+            "state": "queued",
+            "files_total": 0,
+            "files_done": 0,
+            "files_skipped": 0,
+            "files_failed": 0,
+            "bytes_total": 0,
+            "bytes_done": 0,
+            "current": None,
+            "errors": [],
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "error": None,
+            "cancel": threading.Event(),
+            "resume": threading.Event(),
+            "lock": threading.Lock(),
+        }
+        job["resume"].set()
+        with TransferService._jobs_lock:
+            TransferService._jobs[job["id"]] = job
+            finished = [j for j in TransferService._jobs.values() if j["finished_at"] is not None]
+            for old in finished[:-20]:
+                TransferService._jobs.pop(old["id"], None)
+            SharedState.put(JOBS_NAMESPACE, job["id"], TransferService._public(job), ttl=RUNNING_TTL)
+
+        threading.Thread(target=TransferService._run, args=(job,), name="transfer", daemon=True).start()
+        threading.Thread(target=TransferService._publish, args=(job,), name="transfer-publish", daemon=True).start()
+        return TransferService._public(job)
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        public = {k: v for k, v in job.items() if k not in ("cancel", "resume", "lock")}
+        public["errors"] = list(job["errors"])
+        return public
+
+    @staticmethod
+    def _publish(job: Dict[str, Any]) -> None:
+        """Mirror progress to SharedState and apply pause/resume/cancel sent to other workers."""
+        while job["finished_at"] is None:
+            SharedState.put(JOBS_NAMESPACE, job["id"], TransferService._public(job), ttl=RUNNING_TTL)
+            action = SharedState.get(CONTROL_NAMESPACE, job["id"])
+            if action:
+                SharedState.delete(CONTROL_NAMESPACE, job["id"])
+                TransferService._apply(job, action)
+            time.sleep(PUBLISH_INTERVAL)
+        SharedState.put(JOBS_NAMESPACE, job["id"], TransferService._public(job), ttl=FINISHED_TTL)
+
+    @staticmethod
+    def _apply(job: Dict[str, Any], action: str) -> None:
+        if job["finished_at"] is not None:
+            return
+        if action == "cancel":
+            job["cancel"].set()
+            job["resume"].set()  # Wake a paused job so it can stop
+        elif action == "pause":
+            job["resume"].clear()
+            job["state"] = "paused"
+        elif action == "resume":
+            job["resume"].set()
+            job["state"] = "running"
+
+    @staticmethod
+    def list_jobs() -> List[Dict[str, Any]]:
+        jobs = {job_id: job for job_id, job in SharedState.values(JOBS_NAMESPACE).items()}
+        for job in list(TransferService._jobs.values()):
+            jobs[job["id"]] = TransferService._public(job)
+        return sorted(jobs.values(), key=lambda j: j["started_at"], reverse=True)
+
+    @staticmethod
+    def get_job(job_id: str) -> Dict[str, Any]:
+        job = TransferService._jobs.get(job_id)
+        if job is not None:
+            return TransferService._public(job)
+        shared = SharedState.get(JOBS_NAMESPACE, job_id)
+        if shared is None:
+            raise KeyError(job_id)
+        return shared
+
+    @staticmethod
+    def control(job_id: str, action: str) -> None:
+        """Pause, resume or cancel a job, whichever worker process runs it."""
+        job = TransferService._jobs.get(job_id)
+        if job is not None:
+            TransferService._apply(job, action)
+            return
+        if SharedState.get(JOBS_NAMESPACE, job_id) is None:
+            raise KeyError(job_id)
+        SharedState.put(CONTROL_NAMESPACE, job_id, action, ttl=RUNNING_TTL)
+
+    @staticmethod
+    def _checkpoint(job: Dict[str, Any]) -> None:
+        """Block while paused; raise once cancelled."""
+        job["resume"].wait()
+        if job["cancel"].is_set():
+            raise _Cancelled()
+
+    @staticmethod
+    def _add(job: Dict[str, Any], **counts: int) -> None:
+        with job["lock"]:
+            for key, value in counts.items():
+                job[key] += value
+
+    @staticmethod
+    def _fail(job: Dict[str, Any], path: str, error: Exception) -> None:
+        with job["lock"]:
+            job["files_failed"] += 1
+            if len(job["errors"]) < MAX_REPORTED_ERRORS:
+                job["errors"].append({"path": path, "error": str(error)})
+
+    @staticmethod
+    def _resolve_target(src: str, target: str, conflict: str) -> Optional[str]:
+        """Where `src` should go given an existing `target`, or None to skip it."""
+        if not os.path.lexists(target):
+            return target
+        if conflict == "rename":
+            return _unique_name(target)
+        if os.path.isdir(src) and os.path.isdir(target):
+            return target  # Merge folders; files inside follow the policy
+        if conflict == "skip":
+            return None
+        return target
+
+    @staticmethod
+    def _same_device(src: str, dest: str) -> bool:
+        try:
+            return os.lstat(src).st_dev == os.stat(dest).st_dev
+        except OSError:
+            return False
+
+    @staticmethod
+    def _run(job: Dict[str, Any]) -> None:
+        job["state"] = "running"
+        try:
+            copies: List[Tuple[str, str, int]] = []
+            cleanup_dirs: List[str] = []
+            for src in job["sources"]:
+                TransferService._checkpoint(job)
+                target = os.path.join(job["dest"], os.path.basename(src.rstrip(os.sep)))
+                try:
+                    TransferService._plan(job, src, target, copies, cleanup_dirs)
+                except OSError as e:
+                    # One unreadable or vanished source must not abort the others
+                    TransferService._fail(job, src, e)
+
+            job["files_total"] += len(copies)
+            job["bytes_total"] += sum(size for _, _, size in copies)
+            TransferService._copy_all(job, copies)
+
+            if job["op"] == "move":
+                # Deepest first; folders still holding skipped or failed files stay
+                for path in sorted(cleanup_dirs, key=len, reverse=True):
+                    try:
+                        os.rmdir(path)
+                    except OSError:
+                        pass
+            job["state"] = "done"
+        except _Cancelled:
+            job["state"] = "cancelled"
+        except Exception as e:
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["current"] = None
+            job["finished_at"] = datetime.now().isoformat()
+
+    @staticmethod
+    def _plan(job: Dict[str, Any], src: str, target: str,
+              copies: List[Tuple[str, str, int]], cleanup_dirs: List[str]) -> None:
+        """
+        Handle renames immediately and collect (src, target, size) for every
+        file that has to be copied, creating target folders on the way.
+        """
+        target = TransferService._resolve_target(src, target, job["conflict"])
+        if target is None:
+            TransferService._add(job, files_skipped=1)
+            return
+
+        if job["op"] == "move" and TransferService._same_device(src, os.path.dirname(target)):
+            if not os.path.lexists(target) or not os.path.isdir(src):
+                # One rename moves a whole tree, however many files it holds
+                job["current"] = src
+                os.replace(src, target)
+                TransferService._add(job, files_total=1, files_done=1)
+                return
+
+        if os.path.islink(src):
+            copies.append((src, target, 0))
+            return
+        if not os.path.isdir(src):
+            copies.append((src, target, os.path.getsize(src)))
+            return
+
+        os.makedirs(target, exist_ok=True)
+        if job["op"] == "move":
+            cleanup_dirs.append(src)
+        with os.scandir(src) as it:
+            entries = list(it)
+        for entry in entries:
+            TransferService._checkpoint(job)
+            try:
+                TransferService._plan(job, entry.path, os.path.join(target, entry.name), copies, cleanup_dirs)
+            except _Cancelled:
+                raise
+            except OSError as e:
+                TransferService._fail(job, entry.path, e)
+
+    @staticmethod
+    def _copy_all(job: Dict[str, Any], copies: List[Tuple[str, str, int]]) -> None:
+        small = [c for c in copies if c[2] < SMALL_FILE_BYTES]
+        large = [c for c in copies if c[2] >= SMALL_FILE_BYTES]
+
+        workers = max(1, settings.TRANSFER_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transfer-copy") as pool:
+            futures = [pool.submit(TransferService._copy_one, job, *c) for c in small]
+            try:
+                # Large files stream sequentially alongside the small-file pool
+                for item in large:
+                    TransferService._copy_one(job, *item)
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+            except _Cancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    @staticmethod
+    def _copy_one(job: Dict[str, Any], src: str, target: str, size: int) -> None:
+        TransferService._checkpoint(job)
+        job["current"] = src
+        tmp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), tmp_path)
+            else:
+                with open(src, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+                    if size and hasattr(os, "posix_fallocate"):
+                        try:
+                            os.posix_fallocate(fdst.fileno(), 0, size)
+                        except OSError:
+                            pass
+
+                    def on_chunk(sent: int) -> None:
+                        TransferService._add(job, bytes_done=sent)
+                        TransferService._checkpoint(job)
+
+                    copied = _copy_data(fsrc.fileno(), fdst.fileno(), size, on_chunk)
+                    if copied < size:
+                        # Drop the preallocated tail of a file that shrank mid-copy
+                        os.ftruncate(fdst.fileno(), copied)
+                shutil.copystat(src, tmp_path)
+            os.replace(tmp_path, target)
+            if job["op"] == "move":
+                os.remove(src)
+            TransferService._add(job, files_done=1)
+        except _Cancelled:
+            TransferService._discard(tmp_path)
+            raise
+        except OSError as e:
+            TransferService._discard(tmp_path)
+            TransferService._fail(job, src, e)
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
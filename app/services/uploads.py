@@ -0,0 +1,252 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+from typing import Dict, Any, AsyncIterator, List, Optional
+import aiofiles
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.shared_state import SharedState, lock_for
+from app.utils.security import validate_path
+
+SESSIONS_NAMESPACE = "upload_sessions"
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+# Received data is written in pieces of at most this size, so memory per request stays bounded
+WRITE_BUFFER = 1024 * 1024
+
+
+class UploadError(Exception):
+    """A request that doesn't fit the session (wrong length, incomplete, checksum mismatch)."""
+
+
+class UploadService:
+    """
+    Resumable chunked uploads.
+
+    A session reserves a hidden, preallocated temp file next to the target.
+    Chunks are written straight into it at `index * chunk_size`, in any order
+    and in parallel. A sidecar `.chunks` file holds one byte per chunk that is
+    set once that chunk has been fully written, so a client that lost its
+    connection asks for the status and re-sends only the missing chunks.
+    Completing the session optionally verifies a SHA-256 and renames the temp
+    file into place atomically.
+
+    Session records live in SharedState and the chunk map is a file, so any
+    worker process can take any chunk. Sessions idle longer than
+    UPLOAD_SESSION_HOURS are removed together with their temp files.
+    """
+
+    @staticmethod
+    def _check_name(name: str) -> None:
+        if not name or name in (".", "..") or "/" in name or "\\" in name or "\x00" in name:
+            raise ValueError(f"Invalid file name: {name!r}")
+
+    @staticmethod
+    def _unique_target(target: str) -> str:
+        stem, ext = os.path.splitext(target)
+        counter = 1
+        while os.path.lexists(target):
+            target = f"{stem}_{counter}{ext}"
+            counter += 1
+        return target
+
+    @staticmethod
+    def create(dest: str, name: str, size: int, chunk_size: int, overwrite: bool) -> Dict[str, Any]:
+        """Start an upload of `size` bytes into `dest/name`, reserving the disk space up front."""
+        validate_path(dest)
+        UploadService._check_name(name)
+        if not os.path.isdir(dest):
+            raise NotADirectoryError(f"Destination is not a folder: {dest}")
+        chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
+        if shutil.disk_usage(dest).free < size:
+            raise OSError(28, "Not enough free space for this upload")
+
+        UploadService.expire()
+        upload_id = uuid.uuid4().hex
+        target = os.path.join(os.path.abspath(dest), name)
+        validate_path(target)
+        if not overwrite:
+            target = UploadService._unique_target(target)
+        # Fixed-length name: deriving it from `name` could push it past the filesystem's NAME_MAX
+        tmp_path = os.path.join(os.path.dirname(target), f".{upload_id}.upload")
+        with open(tmp_path, "wb") as f:
+            if size:
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except (AttributeError, OSError):
+                    # Not supported here (e.g. Windows, some network filesystems): sparse file instead
+                    f.truncate(size)
+        chunks = (size + chunk_size - 1) // chunk_size
+        with open(tmp_path + ".chunks", "wb") as f:
+            f.write(b"\x00" * chunks)
+
+        session = {
+            "id": upload_id,
+            "target": target,
+            "tmp_path": tmp_path,
+            "size": size,
+            "chunk_size": chunk_size,
+            "chunks": chunks,
+            "overwrite": overwrite,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        SharedState.put(SESSIONS_NAMESPACE, upload_id, session)
+        return UploadService.status(upload_id)
+
+    @staticmethod
+    def _session(upload_id: str) -> Dict[str, Any]:
+        session = SharedState.get(SESSIONS_NAMESPACE, upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        return session
+
+    @staticmethod
+    def _received(session: Dict[str, Any]) -> bytes:
+        try:
+            with open(session["tmp_path"] + ".chunks", "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Completed or aborted since the session was read
+            raise KeyError(session["id"])
+
+    @staticmethod
+    def status(upload_id: str) -> Dict[str, Any]:
+        """Session details plus the chunk indexes still missing."""
+        session = UploadService._session(upload_id)
+        received = UploadService._received(session)
+        missing = [i for i, flag in enumerate(received) if not flag]
+        received_bytes = sum(UploadService._chunk_length(session, i) for i, flag in enumerate(received) if flag)
+        return {
+            "id": session["id"],
+            "path": session["target"],
+            "size": session["size"],
+            "chunk_size": session["chunk_size"],
+            "chunks": session["chunks"],
+            "missing": missing,
+            "received_bytes": received_bytes,
+        }
+
+    @staticmethod
+    def _chunk_length(session: Dict[str, Any], index: int) -> int:
+        return min(session["chunk_size"], session["size"] - index * session["chunk_size"])
+
+    @staticmethod
+    async def write_chunk(upload_id: str, index: int, body: AsyncIterator[bytes]) -> int:
+        """
+        Stream a request body into chunk `index` of the temp file. The chunk is
+        only marked received once exactly its expected length has been written.
+        """
+        session = await run_in_threadpool(UploadService._session, upload_id)
+        if index < 0 or index >= session["chunks"]:
+            raise UploadError(f"Chunk index out of range (0-{session['chunks'] - 1})")
+        offset = index * session["chunk_size"]
+        length = UploadService._chunk_length(session, index)
+        # A re-sent chunk counts as missing until it has been written again in full
+        await run_in_threadpool(UploadService._mark_chunk, session, index, False)
+
+        written = 0
+        buffer = bytearray()
+        try:
+            async with aiofiles.open(session["tmp_path"], "r+b") as f:
+                await f.seek(offset)
+                async for data in body:
+                    written += len(data)
+                    if written > length:
+                        raise UploadError(f"Chunk {index} is larger than {length} bytes")
+                    buffer += data
+                    if len(buffer) >= WRITE_BUFFER:
+                        await f.write(bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await f.write(bytes(buffer))
+        except FileNotFoundError:
+            # Completed or aborted while this chunk was arriving
+            raise KeyError(upload_id)
+        if written != length:
+            raise UploadError(f"Chunk {index} is {written} bytes, expected {length}")
+        await run_in_threadpool(UploadService._mark_chunk, session, index, True)
+        return written
+
+    @staticmethod
+    def _mark_chunk(session: Dict[str, Any], index: int, received: bool) -> None:
+        """
+        Set chunk `index`'s flag. Single-byte writes at distinct offsets never clash;
+        the session lock keeps a late chunk from reviving a completed or aborted session.
+        """
+        with lock_for("upload|" + session["id"]):
+            session = UploadService._session(session["id"])
+            try:
+                fd = os.open(session["tmp_path"] + ".chunks", os.O_WRONLY)
+            except FileNotFoundError:
+                raise KeyError(session["id"])
+            try:
+                os.lseek(fd, index, os.SEEK_SET)
+                os.write(fd, b"\x01" if received else b"\x00")
+            finally:
+                os.close(fd)
+            if received:
+                session["updated_at"] = time.time()
+                SharedState.put(SESSIONS_NAMESPACE, session["id"], session)
+
+    @staticmethod
+    def complete(upload_id: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Verify the upload and move it into place. Returns the final path."""
+        with lock_for("upload|" + upload_id):
+            session = UploadService._session(upload_id)
+            missing = [i for i, flag in enumerate(UploadService._received(session)) if not flag]
+            if missing:
+                raise UploadError(f"{len(missing)} chunk(s) missing, first is {missing[0]}")
+
+            if sha256:
+                digest = hashlib.sha256()
+                with open(session["tmp_path"], "rb") as f:
+                    while chunk := f.read(HASH_CHUNK):
+                        digest.update(chunk)
+                if digest.hexdigest() != sha256.lower():
+                    # Data is unusable; start over rather than resume
+                    UploadService._remove(session)
+                    raise UploadError("Checksum mismatch, upload discarded")
+
+            target = session["target"]
+            if not session["overwrite"]:
+                # Something may have appeared at the target while uploading
+                target = UploadService._unique_target(target)
+            os.replace(session["tmp_path"], target)
+            UploadService._discard(session["tmp_path"] + ".chunks")
+            SharedState.delete(SESSIONS_NAMESPACE, upload_id)
+            return {"path": target, "size": session["size"]}
+
+    @staticmethod
+    def abort(upload_id: str) -> None:
+        with lock_for("upload|" + upload_id):
+            UploadService._remove(UploadService._session(upload_id))
+
+    @staticmethod
+    def _remove(session: Dict[str, Any]) -> None:
+        upload_id = session["id"]
+        UploadService._discard(session["tmp_path"])
+        UploadService._discard(session["tmp_path"] + ".chunks")
+        SharedState.delete(SESSIONS_NAMESPACE, upload_id)
+
+    @staticmethod
+    def expire() -> List[str]:
+        """Remove sessions idle for longer than UPLOAD_SESSION_HOURS, with their temp files."""
+        cutoff = time.time() - settings.UPLOAD_SESSION_HOURS * 3600
+        expired = []
+        for upload_id, session in SharedState.values(SESSIONS_NAMESPACE).items():
+            if session["updated_at"] < cutoff:
+                UploadService.abort(upload_id)
+                expired.append(upload_id)
+        return expired
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,138 @@
+"""
+Build content-hashed, precompressed static assets.
+
+    python -m app.utils.build_assets
+
+Copies every JS/CSS/SVG file under `static/` to `static/dist/` with the
+content hash in its filename, writes `.br`/`.gz` siblings next to each
+one and records the logical -> hashed mapping in `static/dist/manifest.json`.
+
+JS module specifiers are rewritten to absolute logical URLs
+(`/static/js/modules/ui.js`) and resolved to the hashed files through an
+import map in the page, which keeps the module graph free of hash cycles
+(actions.js and viewer.js import each other). CSS `@import`s are rewritten
+to the hashed filenames directly.
+
+This runs at container build time, before settings exist, so it must not
+import anything from `app`.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without it
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent.parent.parent / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_NAME = "manifest.json"
+
+ASSET_EXTENSIONS = {".js", ".css", ".svg"}
+PRECOMPRESS_EXTENSIONS = {".js", ".css", ".svg"}
+
+# from './x.js'  |  import './x.js'  |  import('./x.js')
+JS_SPECIFIER_RE = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(['"])(\.{1,2}/[^'"]+)\2""")
+# @import 'x.css';  |  @import url("x.css");
+CSS_IMPORT_RE = re.compile(r"""(@import\s+(?:url\()?\s*)(['"])([^'"]+)\2""")
+
+
+def _logical(path: Path) -> str:
+    return path.relative_to(STATIC_DIR).as_posix()
+
+
+def _strip_query(specifier: str) -> str:
+    return specifier.split("?", 1)[0].split("#", 1)[0]
+
+
+def _hashed_name(logical: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{digest}{ext}"
+
+
+def _rewrite_js(logical: str, text: str) -> str:
+    base_dir = os.path.dirname(logical)
+
+    def replace(match):
+        target = os.path.normpath(os.path.join(base_dir, _strip_query(match.group(3)))).replace(os.sep, "/")
+        return f"{match.group(1)}{match.group(2)}/static/{target}{match.group(2)}"
+
+    return JS_SPECIFIER_RE.sub(replace, text)
+
+
+def _rewrite_css(logical: str, text: str, manifest: dict) -> str:
+    base_dir = os.path.dirname(logical)
+
+    def replace(match):
+        specifier = _strip_query(match.group(3))
+        if "://" in specifier or specifier.startswith("/"):
+            return match.group(0)
+        target = os.path.normpath(os.path.join(base_dir, specifier)).replace(os.sep, "/")
+        hashed = _build_css(target, manifest)
+        relative = os.path.relpath(hashed, base_dir or ".").replace(os.sep, "/")
+        return f"{match.group(1)}{match.group(2)}{relative}{match.group(2)}"
+
+    return CSS_IMPORT_RE.sub(replace, text)
+
+
+def _emit(logical: str, content: bytes, manifest: dict) -> str:
+    hashed = _hashed_name(logical, content)
+    out_path = DIST_DIR / hashed
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_bytes(content)
+
+    if out_path.suffix in PRECOMPRESS_EXTENSIONS:
+        gz = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(gz) < len(content):
+            out_path.with_name(out_path.name + ".gz").write_bytes(gz)
+        if brotli is not None:
+            br = brotli.compress(content, quality=11)
+            if len(br) < len(content):
+                out_path.with_name(out_path.name + ".br").write_bytes(br)
+
+    manifest[logical] = f"dist/{hashed}"
+    return hashed
+
+
+def _build_css(logical: str, manifest: dict) -> str:
+    if logical in manifest:
+        return manifest[logical][len("dist/"):]
+    text = (STATIC_DIR / logical).read_text(encoding="utf-8")
+    content = _rewrite_css(logical, text, manifest).encode("utf-8")
+    return _emit(logical, content, manifest)
+
+
+def build() -> dict:
+    """Rebuild static/dist from scratch and return the manifest."""
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    DIST_DIR.mkdir(parents=True)
+
+    manifest = {}
+    for path in sorted(STATIC_DIR.rglob("*")):
+        if not path.is_file() or DIST_DIR in path.parents or path.suffix not in ASSET_EXTENSIONS:
+            continue
+        logical = _logical(path)
+        if path.suffix == ".css":
+            _build_css(logical, manifest)
+        elif path.suffix == ".js":
+            text = path.read_text(encoding="utf-8")
+            _emit(logical, _rewrite_js(logical, text).encode("utf-8"), manifest)
+        else:
+            _emit(logical, path.read_bytes(), manifest)
+
+    with open(DIST_DIR / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    result = build()
+    print(f"Built {len(result)} assets into {DIST_DIR}", file=sys.stderr)
@@ -1,5 +1,6 @@
 import os
 from app.core.config import settings
+from app.core.profiling import stage
 
 def validate_path(path: str) -> None:
     """
@@ -9,6 +10,10 @@ def validate_path(path: str) -> None:
     if not path:
         return
 
+    with stage("validate"):
+        _validate_path(path)
+
+def _validate_path(path: str) -> None:
     path_norm = os.path.normpath(path).lower()
     if path_norm.startswith('\\\\?\\') or path_norm.startswith('\\\\.\\'):
         path_norm = path_norm[4:]
@@ -1,6 +1,7 @@
-import { loadPath, handleItemClick, confirmDelete, deleteItem, clearRecentFiles, loadTrash, restoreTrashItem, permanentDeleteTrashItem, renderTrashItems, goUp, loadSidebarDrives, extractArchive } from './modules/actions.js?v=28';
-import { closeModal, openRecentFile, previewArchiveEntry, playFeedVideo, navigateMedia, navigateArchiveMedia, viewerZoom, viewerReset, viewerRotate } from './modules/viewer.js?v=28';
-import { renderArchiveTable, renderArchiveGallery } from './modules/ui.js?v=28';
+import { loadPath, handleItemClick, confirmDelete, deleteItem, clearRecentFiles, loadTrash, restoreTrashItem, permanentDeleteTrashItem, renderTrashItems, goUp, loadSidebarDrives, extractArchive, pickUpload, uploadFiles } from './modules/actions.js';
+import { closeModal, openRecentFile, previewArchiveEntry, playFeedVideo, navigateMedia, navigateArchiveMedia, viewerZoom, viewerReset, viewerRotate, viewerLoadOriginal } from './modules/viewer.js';
+import { renderArchiveTable, renderArchiveGallery } from './modules/ui.js';
+import { cancelPrefetch } from './modules/api.js';
 
 // Expose to window for inline onclicks
 window.loadPath = loadPath;
@@ -19,19 +20,27 @@ window.navigateArchiveMedia = navigateArchiveMedia;
 window.viewerZoom = viewerZoom;
 window.viewerReset = viewerReset;
 window.viewerRotate = viewerRotate;
+window.viewerLoadOriginal = viewerLoadOriginal;
 window.loadTrash = loadTrash;
 window.restoreTrashItem = restoreTrashItem;
 window.permanentDeleteTrashItem = permanentDeleteTrashItem;
 window.goUp = goUp;
 window.loadSidebarDrives = loadSidebarDrives;
 window.extractArchive = extractArchive;
+window.pickUpload = pickUpload;
+window.uploadFiles = uploadFiles;
 
 // Initial load
 document.addEventListener('DOMContentLoaded', () => {
+    const sortSelect = document.getElementById('sort-select');
+    if (sortSelect) sortSelect.value = localStorage.getItem('fileSort') || 'name:asc';
     loadSidebarDrives();
     loadPath('');
 });
 
+// Leaving the app: background pre-warming for this session is no longer useful
+window.addEventListener('pagehide', cancelPrefetch);
+
 // Close modal when clicking outside
 window.onclick = function (event) {
     const modal = document.getElementById('media-modal');
@@ -1,10 +1,10 @@
-import { fetchFiles, fetchArchive, deleteItemAPI } from './api.js?v=28';
-import { renderItems, updateBreadcrumbs, renderArchiveTable, renderRecentFiles, listContainer, mediaContainer, modal } from './ui.js?v=28';
-import { openMedia } from './viewer.js?v=28';
-import { ARCHIVE_EXTS } from './config.js?v=28';
-import { escapeHtml, showToast } from './utils.js?v=28';
-import { closeModal } from './viewer.js?v=28';
-import { getRecentFiles, clearRecentFiles as storeClearRecent } from './store.js?v=28';
+import { fetchFiles, fetchArchive, deleteItemAPI, uploadFile } from './api.js';
+import { renderItems, updateBreadcrumbs, renderArchiveTable, renderRecentFiles, listContainer, mediaContainer, modal } from './ui.js';
+import { openMedia } from './viewer.js';
+import { ARCHIVE_EXTS } from './config.js';
+import { escapeHtml, showToast } from './utils.js';
+import { closeModal } from './viewer.js';
+import { getRecentFiles, clearRecentFiles as storeClearRecent } from './store.js';
 
 // Expose functions to the global window object for inline HTML event handlers
 window.handleItemClick = handleItemClick;
@@ -16,6 +16,7 @@ window.loadPath = loadPath;
 window.loadTrash = loadTrash;
 window.restoreTrashItem = restoreTrashItem;
 window.permanentDeleteTrashItem = permanentDeleteTrashItem;
+window.setSort = setSort;
 // The following functions are not defined in this file, assuming they are imported or defined elsewhere
 // window.renderArchiveGallery = renderArchiveGallery;
 // window.previewArchiveEntry = previewArchiveEntry;
@@ -30,6 +31,19 @@ const currentLimit = 100;
 let hasMoreFiles = false;
 let isLoadingMore = false;
 let scrollObserver = null;
+// Listing order, e.g. 'name:asc' or 'taken:desc' (see the header sort menu)
+let currentSort = localStorage.getItem('fileSort') || 'name:asc';
+
+export function setSort(value) {
+    currentSort = value;
+    localStorage.setItem('fileSort', value);
+    if (currentPath && currentPath !== 'TRASH') loadPath(currentPath);
+}
+
+function sortParams() {
+    const [sort, order] = currentSort.split(':');
+    return [sort, order || 'asc'];
+}
 
 export function getCurrentItems() {
     return currentItems;
@@ -141,7 +155,7 @@ export async function loadPath(path) {
             `;
             
             listContainer.innerHTML = html;
-            const { renderRecentFiles } = await import('./ui.js?v=21');
+            const { renderRecentFiles } = await import('./ui.js');
             renderRecentFiles(getRecentFiles());
         } catch (error) {
             listContainer.innerHTML = `<div class="loading" style="background:var(--c-pink); color:#000;">ERROR: ${error.message}</div>`;
@@ -161,7 +175,7 @@ export async function loadPath(path) {
     if (oldSentinel) oldSentinel.remove();
 
     try {
-        const data = await fetchFiles(path, currentSkip, currentLimit);
+        const data = await fetchFiles(path, currentSkip, currentLimit, ...sortParams(), 'names');
         currentItems = data.items;
         hasMoreFiles = data.has_more;
         currentSkip += currentLimit;
@@ -187,7 +201,7 @@ export async function loadMoreFiles() {
     listContainer.appendChild(loader);
 
     try {
-        const data = await fetchFiles(currentPath, currentSkip, currentLimit);
+        const data = await fetchFiles(currentPath, currentSkip, currentLimit, ...sortParams(), 'names');
         currentItems = currentItems.concat(data.items);
         hasMoreFiles = data.has_more;
         currentSkip += currentLimit;
@@ -348,7 +362,7 @@ export async function loadTrash() {
     if (recentSection) recentSection.style.display = 'none';
 
     try {
-        const { fetchTrash } = await import('./api.js?v=21');
+        const { fetchTrash } = await import('./api.js');
         const items = await fetchTrash();
         currentItems = items;
         renderTrashItems(items);
@@ -403,7 +417,7 @@ export async function restoreTrashItem(event, trashId) {
     mediaContainer.innerHTML = '<div class="loading" style="background:var(--c-green); color:#000;">RESTORING...</div>';
 
     try {
-        const { restoreItemAPI } = await import('./api.js?v=29');
+        const { restoreItemAPI } = await import('./api.js');
         await restoreItemAPI(trashId);
         showToast('✅ Item restored to original location');
         loadTrash(); // Reload trash view
@@ -441,7 +455,7 @@ window._executePermanentDelete = async function (trashId) {
     mediaContainer.innerHTML = '<div class="loading" style="background:var(--c-pink); color:#000;">DESTROYING...</div>';
 
     try {
-        const { permanentDeleteItemAPI } = await import('./api.js?v=26');
+        const { permanentDeleteItemAPI } = await import('./api.js');
         await permanentDeleteItemAPI(trashId);
         closeModal();
         showToast('☢️ Item permanently destroyed');
@@ -498,7 +512,7 @@ export async function extractArchive(path, providedPassword = null) {
     mediaContainer.innerHTML = '<div class="loading" style="background:var(--c-cyan); color:#000;">EXTRACTING...</div>';
     
     try {
-        const { extractArchiveAPI } = await import('./api.js?v=28');
+        const { extractArchiveAPI } = await import('./api.js');
         const pwd = providedPassword || mediaContainer._archivePassword || null;
         await extractArchiveAPI(path, pwd);
         closeModal();
@@ -523,3 +537,35 @@ export async function extractArchive(path, providedPassword = null) {
         `;
     }
 };
+
+export function pickUpload() {
+    if (!currentPath || currentPath === 'TRASH') {
+        showToast('📂 Open a folder to upload into');
+        return;
+    }
+    document.getElementById('upload-input').click();
+}
+
+// Files go up one after another, each in parallel chunks; an interrupted
+// file resumes from its missing chunks when it is picked again.
+export async function uploadFiles(input) {
+    const files = [...input.files];
+    input.value = '';
+    const dest = currentPath;
+    let failed = 0;
+
+    for (const [i, file] of files.entries()) {
+        try {
+            await uploadFile(file, dest, (sent, total) => {
+                const percent = total ? Math.floor((sent / total) * 100) : 100;
+                showToast(`⬆️ ${i + 1}/${files.length} ${file.name} — ${percent}%`, 0);
+            });
+        } catch (error) {
+            failed++;
+            showToast(`⚠️ ${file.name}: ${error.message}`);
+        }
+    }
+
+    showToast(failed ? `⚠️ ${failed} of ${files.length} upload(s) failed — pick them again to resume` : `⬆️ Uploaded ${files.length} file(s)`);
+    if (currentPath === dest) loadPath(dest);
+}
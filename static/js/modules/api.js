@@ -1,9 +1,23 @@
-import { API_BASE } from './config.js?v=26';
+import { API_BASE, UPLOAD_API } from './config.js';
+import { formatSize, formatTimestamp } from './utils.js';
 
-export async function fetchFiles(path, skip = 0, limit = 100) {
+// Turn a `format=compact` columnar response back into row objects
+function expandColumns(payload, mapRow) {
+    const { columns, data } = payload;
+    const count = columns.length ? data[columns[0]].length : 0;
+    const rows = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const row = {};
+        for (const column of columns) row[column] = data[column][i];
+        rows[i] = mapRow(row);
+    }
+    return rows;
+}
+
+export async function fetchFiles(path, skip = 0, limit = 100, sort = 'name', order = 'asc', mode = 'full') {
     let url = path ? `${API_BASE}/list?path=${encodeURIComponent(path)}` : `${API_BASE}/list`;
     const separator = url.includes('?') ? '&' : '?';
-    url += `${separator}skip=${skip}&limit=${limit}`;
+    url += `${separator}skip=${skip}&limit=${limit}&sort=${sort}&order=${order}&mode=${mode}&metadata=true&format=compact`;
     const response = await fetch(url);
 
     if (!response.ok) {
@@ -11,11 +25,80 @@ export async function fetchFiles(path, skip = 0, limit = 100) {
         throw new Error(err.detail || 'Failed to fetch files');
     }
 
+    const data = await response.json();
+    // Drive listings are always sent in the full format
+    if (data.format !== 'compact') return data;
+    const prefix = data.base.endsWith(data.sep) ? data.base : data.base + data.sep;
+    data.items = expandColumns(data, (row) => {
+        const isDir = !!row.is_dir;
+        const item = { name: row.name, path: prefix + row.name, is_dir: isDir, type: isDir ? 'folder' : 'file' };
+        if ('size' in row) item.size = isDir ? '-' : formatSize(row.size);
+        if ('modified' in row) item.modified = formatTimestamp(row.modified);
+        if (row.meta) item.meta = row.meta;
+        return item;
+    });
+    return data;
+}
+
+// Stop the server pre-warming thumbnails and subfolders for this session.
+// A beacon still gets delivered while the page is being unloaded.
+export function cancelPrefetch() {
+    navigator.sendBeacon(`${API_BASE}/prefetch/cancel`);
+}
+
+// Size / mtime / mime / media metadata for a batch of paths from a names-only listing
+export async function hydrateFiles(paths, metadata = true) {
+    const response = await fetch(`${API_BASE}/hydrate`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ paths, metadata })
+    });
+    if (!response.ok) {
+        const err = await response.json();
+        throw new Error(err.detail || 'Failed to load file details');
+    }
+    return await response.json();
+}
+
+export async function fetchStreamInfo(path) {
+    const response = await fetch(`${API_BASE}/stream/info?path=${encodeURIComponent(path)}`);
+    if (!response.ok) {
+        const err = await response.json();
+        throw new Error(err.detail || 'Failed to probe video');
+    }
+    return await response.json();
+}
+
+// Where a remuxed fMP4 stream started at `time` really begins (the keyframe at or before it)
+export async function fetchKeyframe(path, time) {
+    const response = await fetch(`${API_BASE}/stream/keyframe?path=${encodeURIComponent(path)}&time=${time}`);
+    if (!response.ok) {
+        const err = await response.json();
+        throw new Error(err.detail || 'Failed to find keyframe');
+    }
+    return (await response.json()).time;
+}
+
+export async function fetchSpriteMap(path) {
+    const response = await fetch(`${API_BASE}/thumbnail/sprite/map?path=${encodeURIComponent(path)}`);
+    if (!response.ok) {
+        const err = await response.json();
+        throw new Error(err.detail || 'Failed to load sprite');
+    }
+    return await response.json();
+}
+
+export async function fetchTextLines(path, start, count) {
+    const response = await fetch(`${API_BASE}/text/lines?path=${encodeURIComponent(path)}&start=${start}&count=${count}`);
+    if (!response.ok) {
+        const err = await response.json();
+        throw new Error(err.detail || 'Failed to read text');
+    }
     return await response.json();
 }
 
 export async function fetchArchive(path, password = null) {
-    let url = `${API_BASE}/archive?path=${encodeURIComponent(path)}`;
+    let url = `${API_BASE}/archive?path=${encodeURIComponent(path)}&format=compact`;
     if (password) {
         url += `&password=${encodeURIComponent(password)}`;
     }
@@ -31,7 +114,14 @@ export async function fetchArchive(path, password = null) {
         throw error;
     }
 
-    return await response.json();
+    const data = await response.json();
+    data.entries = expandColumns(data, (row) => {
+        row.is_dir = !!row.is_dir;
+        row.size_fmt = row.is_dir ? '-' : formatSize(row.size);
+        row.compressed_fmt = row.is_dir ? '-' : formatSize(row.compressed);
+        return row;
+    });
+    return data;
 }
 
 export async function deleteItemAPI(path) {
@@ -46,12 +136,17 @@ export async function deleteItemAPI(path) {
 }
 
 export async function fetchTrash() {
-    const response = await fetch(`${API_BASE}/trash`);
+    const response = await fetch(`${API_BASE}/trash?format=compact`);
     if (!response.ok) {
         const err = await response.json();
         throw new Error(err.detail || 'Failed to fetch trash');
     }
-    return await response.json();
+    return expandColumns(await response.json(), (row) => {
+        row.is_dir = !!row.is_dir;
+        row.size = row.is_dir ? '-' : formatSize(row.size);
+        row.deleted_at_fmt = row.deleted_at ? formatTimestamp(row.deleted_at) : 'Unknown';
+        return row;
+    });
 }
 
 export async function restoreItemAPI(trashId) {
@@ -94,3 +189,66 @@ export async function extractArchiveAPI(path, password = null) {
     }
     return await response.json();
 }
+
+// --- Resumable uploads ---
+const UPLOAD_CONCURRENCY = 4;
+const UPLOAD_RETRIES = 5;
+
+async function uploadRequest(url, options, fallback) {
+    const response = await fetch(url, options);
+    if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        const error = new Error(err.detail || fallback);
+        error.status = response.status;
+        throw error;
+    }
+    return await response.json();
+}
+
+// Upload a File into `dest` in parallel chunks. The session id is kept in
+// localStorage, so re-uploading the same file after a failure or reload only
+// sends the chunks the server is still missing.
+export async function uploadFile(file, dest, onProgress = () => {}) {
+    const resumeKey = `upload:${dest}|${file.name}|${file.size}|${file.lastModified}`;
+    let status = null;
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        status = await uploadRequest(`${UPLOAD_API}/${savedId}`, {}, 'Upload expired').catch(() => null);
+    }
+    if (!status) {
+        const params = new URLSearchParams({ dest, name: file.name, size: file.size });
+        status = await uploadRequest(`${UPLOAD_API}?${params}`, { method: 'POST' }, 'Failed to start upload');
+        localStorage.setItem(resumeKey, status.id);
+    }
+
+    const base = `${UPLOAD_API}/${status.id}`;
+    const queue = [...status.missing];
+    let received = status.received_bytes;
+    onProgress(received, file.size);
+
+    async function sendChunk(index) {
+        const start = index * status.chunk_size;
+        const blob = file.slice(start, Math.min(file.size, start + status.chunk_size));
+        for (let attempt = 0; ; attempt++) {
+            try {
+                await uploadRequest(`${base}/chunks/${index}`, { method: 'PUT', body: blob }, 'Failed to upload chunk');
+                received += blob.size;
+                onProgress(received, file.size);
+                return;
+            } catch (error) {
+                // Client errors won't go away by retrying
+                if (attempt >= UPLOAD_RETRIES || (error.status >= 400 && error.status < 500)) throw error;
+                await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+            }
+        }
+    }
+
+    const workers = Array.from({ length: Math.min(UPLOAD_CONCURRENCY, queue.length) }, async () => {
+        while (queue.length) await sendChunk(queue.shift());
+    });
+    await Promise.all(workers);
+
+    const result = await uploadRequest(`${base}/complete`, { method: 'POST' }, 'Failed to finish upload');
+    localStorage.removeItem(resumeKey);
+    return result;
+}
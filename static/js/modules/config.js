@@ -1,4 +1,5 @@
 export const API_BASE = '/api/files';
+export const UPLOAD_API = '/api/uploads';
 export const IMAGE_EXTS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'ico'];
 export const VIDEO_EXTS = ['mp4', 'webm', 'ogg', 'mov', 'mkv', 'avi'];
 export const ARCHIVE_EXTS = ['zip', 'tar', 'gz', 'bz2', '7z', 'rar'];
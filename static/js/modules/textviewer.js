@@ -0,0 +1,166 @@
+import { API_BASE } from './config.js';
+import { fetchTextLines } from './api.js';
+import { escapeHtml } from './utils.js';
+
+// Virtual-scrolling text viewer: only the visible lines exist in the DOM and
+// they are fetched in pages from /text/lines, so multi-GB logs open instantly.
+const LINE_HEIGHT = 20;        // px, matches .text-virtual-rows line-height
+const PAGE_SIZE = 500;         // lines per request
+const MAX_CACHED_PAGES = 40;
+// Browsers cap element heights (~16M px in Firefox); past this the scrollbar maps proportionally
+const MAX_SCROLL_HEIGHT = 8000000;
+
+let state = null;
+
+export function openTextViewer(container, path) {
+    closeTextViewer();
+    container.innerHTML = `
+        <div class="text-virtual-scroll">
+            <div class="text-virtual-spacer"></div>
+            <div class="text-virtual-rows"></div>
+        </div>`;
+    const scroller = container.querySelector('.text-virtual-scroll');
+    state = {
+        path,
+        container,
+        scroller,
+        spacer: container.querySelector('.text-virtual-spacer'),
+        rows: container.querySelector('.text-virtual-rows'),
+        pages: new Map(),
+        pending: new Set(),
+        total: 0,
+        tailLine: 0,
+        tailOffset: 0,
+        source: null,
+        frame: 0,
+    };
+    scroller.addEventListener('scroll', scheduleRender);
+
+    const current = state;
+    loadPage(0).catch(err => {
+        if (state === current) container.textContent = 'Failed to load text: ' + err.message;
+    });
+}
+
+export function closeTextViewer() {
+    if (!state) return;
+    if (state.source) state.source.close();
+    if (state.frame) cancelAnimationFrame(state.frame);
+    state.scroller.removeEventListener('scroll', scheduleRender);
+    state = null;
+}
+
+function updateLineCount() {
+    const el = document.getElementById('text-line-count');
+    if (el) el.textContent = `${state.total.toLocaleString()} LINES`;
+}
+
+async function loadPage(index) {
+    const current = state;
+    if (current.pages.has(index) || current.pending.has(index)) return;
+    current.pending.add(index);
+    try {
+        const data = await fetchTextLines(current.path, index * PAGE_SIZE, PAGE_SIZE);
+        if (state !== current) return;
+        current.pages.set(index, data.lines);
+        // Map keeps insertion order: drop the oldest pages first
+        while (current.pages.size > MAX_CACHED_PAGES) {
+            current.pages.delete(current.pages.keys().next().value);
+        }
+        if (!current.source) {
+            current.total = data.total_lines;
+            current.tailLine = data.tail_line;
+            current.tailOffset = data.tail_offset;
+        }
+        updateLineCount();
+        scheduleRender();
+    } finally {
+        current.pending.delete(index);
+    }
+}
+
+function scheduleRender() {
+    if (!state || state.frame) return;
+    state.frame = requestAnimationFrame(() => {
+        state.frame = 0;
+        render();
+    });
+}
+
+function render() {
+    const { scroller, spacer, rows, pages, total } = state;
+    const visible = Math.ceil(scroller.clientHeight / LINE_HEIGHT) + 1;
+    const fullHeight = total * LINE_HEIGHT;
+    const scaled = fullHeight > MAX_SCROLL_HEIGHT;
+    spacer.style.height = `${Math.min(fullHeight, MAX_SCROLL_HEIGHT)}px`;
+
+    let first;
+    if (scaled) {
+        const maxScroll = Math.max(1, scroller.scrollHeight - scroller.clientHeight);
+        first = Math.floor((scroller.scrollTop / maxScroll) * Math.max(0, total - visible));
+        rows.style.transform = `translateY(${scroller.scrollTop}px)`;
+    } else {
+        first = Math.floor(scroller.scrollTop / LINE_HEIGHT);
+        rows.style.transform = `translateY(${first * LINE_HEIGHT}px)`;
+    }
+
+    const last = Math.min(total, first + visible);
+    const gutter = String(total).length;
+    let html = '';
+    for (let i = first; i < last; i++) {
+        const page = Math.floor(i / PAGE_SIZE);
+        const lines = pages.get(page);
+        if (!lines) loadPage(page).catch(() => {});
+        const text = lines ? (lines[i - page * PAGE_SIZE] ?? '') : '';
+        html += `<div class="text-line"><span class="text-line-no">${String(i + 1).padStart(gutter)}</span>${escapeHtml(text)}</div>`;
+    }
+    rows.innerHTML = html;
+}
+
+function isAtBottom() {
+    const { scroller } = state;
+    return scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - LINE_HEIGHT;
+}
+
+export async function toggleTextFollow() {
+    if (!state) return;
+    const btn = document.getElementById('text-follow-btn');
+    if (state.source) {
+        state.source.close();
+        state.source = null;
+        if (btn) btn.classList.remove('active');
+        return;
+    }
+
+    // Refresh the last page so nothing appended since it loaded is skipped
+    const current = state;
+    const lastPage = Math.floor(Math.max(0, current.total - 1) / PAGE_SIZE);
+    current.pages.delete(lastPage);
+    await loadPage(lastPage);
+    if (state !== current || current.source) return;
+
+    const url = `${API_BASE}/text/tail?path=${encodeURIComponent(current.path)}&offset=${current.tailOffset}&line=${current.tailLine}`;
+    const source = new EventSource(url);
+    current.source = source;
+    if (btn) btn.classList.add('active');
+    current.scroller.scrollTop = current.scroller.scrollHeight;
+
+    source.onmessage = (event) => {
+        if (state !== current) return;
+        const { line, text } = JSON.parse(event.data);
+        const stick = isAtBottom();
+        // Lines landing in pages we don't hold are fetched from the server when scrolled to
+        const lines = current.pages.get(Math.floor(line / PAGE_SIZE));
+        if (lines) lines[line % PAGE_SIZE] = text;
+        current.total = Math.max(current.total, line + 1);
+        updateLineCount();
+        render();
+        if (stick) current.scroller.scrollTop = current.scroller.scrollHeight;
+    };
+    source.addEventListener('reset', () => {
+        // File was truncated or rotated: start over
+        if (state !== current) return;
+        openTextViewer(current.container, current.path);
+        if (btn) btn.classList.remove('active');
+    });
+}
@@ -1,5 +1,126 @@
-import { API_BASE, IMAGE_EXTS, VIDEO_EXTS, ARCHIVE_EXTS, AUDIO_EXTS, TEXT_EXTS } from './config.js?v=28';
-import { escapeHtml } from './utils.js?v=28';
+import { API_BASE, IMAGE_EXTS, VIDEO_EXTS, ARCHIVE_EXTS, AUDIO_EXTS, TEXT_EXTS } from './config.js';
+import { escapeHtml } from './utils.js';
+import { fetchSpriteMap, hydrateFiles } from './api.js';
+
+// Sprite timing maps by video path, so each strip is fetched once per page load
+const spriteMaps = new Map();
+
+// Listings arrive names-only; size, date and media badges are filled in for
+// cards as they scroll into view, in batches.
+const HYDRATE_BATCH = 100;
+const hydrationTargets = new Map();   // path -> { card, item }
+const hydrationQueue = new Set();
+let hydrationTimer = null;
+const hydrationObserver = new IntersectionObserver((entries) => {
+    for (const entry of entries) {
+        if (!entry.isIntersecting) continue;
+        hydrationObserver.unobserve(entry.target);
+        hydrationQueue.add(entry.target.getAttribute('data-file-path'));
+    }
+    if (hydrationQueue.size && !hydrationTimer) hydrationTimer = setTimeout(flushHydration, 30);
+}, { rootMargin: '200px' });
+
+async function flushHydration() {
+    hydrationTimer = null;
+    const paths = [...hydrationQueue].slice(0, HYDRATE_BATCH);
+    paths.forEach(p => hydrationQueue.delete(p));
+    if (hydrationQueue.size) hydrationTimer = setTimeout(flushHydration, 30);
+
+    let data;
+    try {
+        data = await hydrateFiles(paths);
+    } catch (e) {
+        return;
+    }
+    for (const [path, details] of Object.entries(data.items)) {
+        const target = hydrationTargets.get(path);
+        if (!target || details.error) continue;
+        hydrationTargets.delete(path);
+        Object.assign(target.item, details);
+        const ext = target.item.name.split('.').pop().toLowerCase();
+        const metaEl = target.card.querySelector('.file-meta');
+        if (metaEl && details.size && details.size !== '-') metaEl.textContent = details.size;
+        const icon = target.card.querySelector('.icon');
+        if (icon) icon.insertAdjacentHTML('beforeend', mediaBadges(target.item, ext));
+        if (details.meta && details.meta.taken) {
+            const nameEl = target.card.querySelector('.file-name');
+            if (nameEl) nameEl.title = `${target.item.name} (taken ${details.meta.taken})`;
+        }
+    }
+}
+
+function resetHydration() {
+    hydrationObserver.disconnect();
+    hydrationTargets.clear();
+    hydrationQueue.clear();
+}
+
+// Thumbnail at a CSS-pixel size preset; append `&scale=2` for the HiDPI variant
+function thumbnailUrl(path, size) {
+    return `${API_BASE}/thumbnail?path=${encodeURIComponent(path)}&size=${size}`;
+}
+
+function formatDuration(seconds) {
+    const s = Math.round(seconds);
+    const h = Math.floor(s / 3600);
+    const m = Math.floor((s % 3600) / 60);
+    const sec = String(s % 60).padStart(2, '0');
+    return h ? `${h}:${String(m).padStart(2, '0')}:${sec}` : `${m}:${sec}`;
+}
+
+function resolutionLabel(width, height, isVideo) {
+    if (!isVideo) return `${width}×${height}`;
+    const lines = Math.min(width, height);
+    if (lines >= 2160) return '4K';
+    if (lines >= 1440) return '1440p';
+    return `${lines}p`;
+}
+
+// Resolution / duration badges over the thumbnail, from the listing's `meta`
+function mediaBadges(item, ext) {
+    const meta = item.meta;
+    if (!meta) return '';
+    const isVideo = VIDEO_EXTS.includes(ext);
+    let html = '';
+    if (meta.width && meta.height) {
+        html += `<span class="media-badge media-badge--res">${resolutionLabel(meta.width, meta.height, isVideo)}</span>`;
+    }
+    if (meta.duration) {
+        html += `<span class="media-badge media-badge--duration">${formatDuration(meta.duration)}</span>`;
+    }
+    return html;
+}
+
+function attachHoverScrub(card, item) {
+    const icon = card.querySelector('.icon');
+    if (!icon) return;
+    icon.style.position = 'relative';
+    const scrub = document.createElement('div');
+    scrub.className = 'thumb-scrub';
+    icon.appendChild(scrub);
+
+    card.addEventListener('mouseenter', () => {
+        if (!spriteMaps.has(item.path)) {
+            spriteMaps.set(item.path, fetchSpriteMap(item.path).catch(() => null));
+        }
+        spriteMaps.get(item.path).then(map => {
+            if (!map) return;
+            scrub.style.backgroundImage = `url("${map.url}")`;
+            scrub.style.backgroundSize = `${map.frames * 100}% 100%`;
+            scrub.classList.add('ready');
+            scrub._map = map;
+        });
+    });
+
+    card.addEventListener('mousemove', (e) => {
+        const map = scrub._map;
+        if (!map) return;
+        const rect = card.getBoundingClientRect();
+        const ratio = Math.min(Math.max((e.clientX - rect.left) / rect.width, 0), 0.999);
+        const index = Math.floor(ratio * map.frames);
+        scrub.style.backgroundPosition = `${map.frames > 1 ? (index / (map.frames - 1)) * 100 : 0}% 0`;
+    });
+}
 
 export const listContainer = document.getElementById('file-list');
 export const breadcrumbContainer = document.getElementById('breadcrumb');
@@ -9,6 +130,7 @@ export const modal = document.getElementById('media-modal');
 export function renderItems(items, append = false) {
     if (!append) {
         listContainer.innerHTML = '';
+        resetHydration();
     }
 
     if (items.length === 0 && !append) {
@@ -32,8 +154,8 @@ export function renderItems(items, append = false) {
         let iconContent;
 
         if (!item.is_dir && (IMAGE_EXTS.includes(ext) || VIDEO_EXTS.includes(ext))) {
-            const viewUrl = `/api/files/thumbnail?path=${encodeURIComponent(item.path)}`;
-            iconContent = `<img src="${viewUrl}" class="file-thumbnail" alt="${escapeHtml(item.name)}" loading="lazy" onerror="this.onerror=null;this.parentNode.innerHTML='📄'">`;
+            const viewUrl = thumbnailUrl(item.path, 128);
+            iconContent = `<img src="${viewUrl}" srcset="${viewUrl} 1x, ${viewUrl}&scale=2 2x" class="file-thumbnail" alt="${escapeHtml(item.name)}" loading="lazy" decoding="async" onerror="this.onerror=null;this.parentNode.innerHTML='📄'">`;
         } else {
             const fileExt = item.name.split('.').pop().toLowerCase();
             if (fileExt === 'pdf') {
@@ -88,9 +210,9 @@ export function renderItems(items, append = false) {
         const escapedName = item.name.replace(/'/g, "\\'");
 
         card.innerHTML = `
-            <div class="icon">${iconContent}</div>
+            <div class="icon">${iconContent}${mediaBadges(item, ext)}</div>
             <div class="file-info">
-                <span class="file-name" title="${escapeHtml(item.name)}">${escapeHtml(item.name)}</span>
+                <span class="file-name" title="${escapeHtml(item.name)}${item.meta && item.meta.taken ? ` (taken ${item.meta.taken})` : ''}">${escapeHtml(item.name)}</span>
                 <div class="${metaClass}">${metaText}</div>
             </div>
             ${progressHtml}
@@ -99,8 +221,17 @@ export function renderItems(items, append = false) {
             </div>` : ''}
         `;
 
+        if (!item.is_dir && VIDEO_EXTS.includes(ext)) {
+            attachHoverScrub(card, item);
+        }
+
         card.style.animationDelay = `${(index % 20) * 30}ms`;
         listContainer.appendChild(card);
+
+        if (!item.is_dir && item.size === undefined) {
+            hydrationTargets.set(item.path, { card, item });
+            hydrationObserver.observe(card);
+        }
     });
 }
 
@@ -308,16 +439,14 @@ export function renderRecentFiles(recent) {
 
     let thumbsHtml = '';
     for (const file of recent) {
-        const thumbUrl = file.isImage
-            ? `${API_BASE}/thumbnail?path=${encodeURIComponent(file.path)}`
-            : '';
+        const thumbUrl = file.isImage ? thumbnailUrl(file.path, 256) : '';
         const shortName = file.name.split('/').pop().split('\\').pop();
         const escapedPath = file.path.replace(/\\/g, '\\\\').replace(/'/g, "\\'");
 
         thumbsHtml += `
             <div class="recent-file-thumb" onclick="window.openRecentFile('${escapedPath}', '${shortName.replace(/'/g, "\\'")}')" title="${escapeHtml(shortName)}">
                 ${file.isImage
-                ? `<img src="${thumbUrl}" alt="${escapeHtml(shortName)}" loading="lazy">`
+                ? `<img src="${thumbUrl}" srcset="${thumbUrl} 1x, ${thumbUrl}&scale=2 2x" alt="${escapeHtml(shortName)}" loading="lazy" decoding="async">`
                 : `<div style="display:flex;align-items:center;justify-content:center;height:100%;font-size:2rem;background:#222;">🎬</div>`}
                 <div class="recent-file-name">${escapeHtml(shortName)}</div>
             </div>`;
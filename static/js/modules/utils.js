@@ -4,12 +4,31 @@ export function escapeHtml(str) {
     return div.innerHTML;
 }
 
-export function showToast(message) {
+// `duration` 0 keeps the toast until the next one replaces it (progress messages)
+export function showToast(message, duration = 3000) {
     const existing = document.querySelector('.file-toast');
     if (existing) existing.remove();
     const toast = document.createElement('div');
     toast.className = 'file-toast';
     toast.textContent = message;
     document.body.appendChild(toast);
-    setTimeout(() => toast.remove(), 3000);
+    if (duration) setTimeout(() => toast.remove(), duration);
+}
+
+// Same output as app/utils/formatters.py, for compact listings that send raw numbers
+export function formatSize(bytes) {
+    if (bytes === 0) return '0 B';
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let i = 0;
+    while (bytes >= 1024 && i < units.length - 1) {
+        bytes /= 1024;
+        i++;
+    }
+    return `${bytes.toFixed(2)} ${units[i]}`;
+}
+
+export function formatTimestamp(epochSeconds) {
+    const d = new Date(epochSeconds * 1000);
+    const pad = (n) => String(n).padStart(2, '0');
+    return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())} ${pad(d.getHours())}:${pad(d.getMinutes())}:${pad(d.getSeconds())}`;
 }
@@ -1,8 +1,14 @@
-import { API_BASE, IMAGE_EXTS, VIDEO_EXTS, AUDIO_EXTS, TEXT_EXTS } from './config.js?v=28';
-import { escapeHtml } from './utils.js?v=28';
-import { mediaContainer, modal } from './ui.js?v=28';
-import { addRecentFile } from './store.js?v=28';
-import { getCurrentItems } from './actions.js?v=28';
+import { API_BASE, IMAGE_EXTS, VIDEO_EXTS, AUDIO_EXTS, TEXT_EXTS } from './config.js';
+import { escapeHtml } from './utils.js';
+import { mediaContainer, modal } from './ui.js';
+import { addRecentFile } from './store.js';
+import { getCurrentItems } from './actions.js';
+import { fetchStreamInfo, fetchKeyframe } from './api.js';
+import { openTextViewer, closeTextViewer, toggleTextFollow } from './textviewer.js';
+
+// Containers the browser opens straight from /view; others are probed and
+// may be remuxed or transcoded server-side (HLS or fragmented MP4).
+const NATIVE_VIDEO_EXTS = ['mp4', 'webm', 'ogg'];
 
 let currentMediaItem = null;
 let currentArchiveEntryName = null;
@@ -114,11 +120,26 @@ function attachZoomPanEvents() {
     });
 }
 
+// Screen-sized rendition of an image; the original is fetched only on demand
+function previewUrl(path) {
+    const longEdge = Math.max(window.screen.width, window.screen.height) * (window.devicePixelRatio || 1);
+    return `${API_BASE}/preview?path=${encodeURIComponent(path)}&width=${Math.min(3840, Math.round(longEdge))}`;
+}
+
+export function viewerLoadOriginal() {
+    const img = document.getElementById('viewer-image');
+    if (!img || !img.dataset.original || img.dataset.original === img.getAttribute('src')) return;
+    img.src = img.dataset.original;
+}
+
 export function viewerZoom(amount) {
     zoomLevel += amount;
     if (zoomLevel < 0.5) zoomLevel = 0.5;
     if (zoomLevel > 5) zoomLevel = 5;
 
+    // Zooming past the preview's resolution: swap in the full-size original
+    if (zoomLevel > 1.5) viewerLoadOriginal();
+
     const wrapper = document.getElementById('viewer-image-wrapper');
     if (wrapper) {
         wrapper.style.cursor = zoomLevel > 1 ? 'grab' : 'default';
@@ -165,14 +186,99 @@ function initPlayer() {
     }
     const mediaEl = document.querySelector('#media-container video, #media-container audio');
     if (mediaEl && window.Plyr) {
-        window.plyrInstance = new window.Plyr(mediaEl, { 
+        const options = {
             autoplay: true,
             iconUrl: '/static/plyr.svg'
-        });
+        };
+        // Seek-bar previews come from the cached sprite strip, no extra decoding
+        if (mediaEl.tagName === 'VIDEO' && mediaEl.dataset.path) {
+            options.previewThumbnails = {
+                enabled: true,
+                src: `${API_BASE}/thumbnail/sprite.vtt?path=${encodeURIComponent(mediaEl.dataset.path)}`
+            };
+        }
+        window.plyrInstance = new window.Plyr(mediaEl, options);
+    }
+}
+
+async function resolveVideoSource(path, ext) {
+    const viewUrl = `${API_BASE}/view?path=${encodeURIComponent(path)}`;
+    if (NATIVE_VIDEO_EXTS.includes(ext)) return { src: viewUrl, type: `video/${ext}` };
+
+    try {
+        const plan = await fetchStreamInfo(path);
+        if (plan.mode === 'direct') return { src: viewUrl, type: 'video/mp4' };
+        const probe = document.createElement('video');
+        if (probe.canPlayType('application/vnd.apple.mpegurl')) {
+            return { src: `${API_BASE}/stream/playlist.m3u8?path=${encodeURIComponent(path)}`, type: 'application/vnd.apple.mpegurl' };
+        }
+        return { src: fmp4Url(path, 0), type: 'video/mp4', plan };
+    } catch (e) {
+        // Probe failed (e.g. no ffprobe): let the browser try the raw file
+        return { src: viewUrl, type: 'video/mp4' };
     }
 }
 
+function fmp4Url(path, start) {
+    return `${API_BASE}/stream/fmp4?path=${encodeURIComponent(path)}&start=${start}`;
+}
+
+// A progressive fMP4 stream can't seek past what has arrived. Seeking beyond the
+// buffer restarts the stream at the target (a keyframe when remuxing), and the
+// element's clock is offset so the player shows the position in the whole video.
+function attachFmp4Seeking(video, path, plan) {
+    const clock = Object.getOwnPropertyDescriptor(HTMLMediaElement.prototype, 'currentTime');
+    let offset = 0;
+    const bufferedEnd = () => video.buffered.length ? video.buffered.end(video.buffered.length - 1) : 0;
+
+    const restart = async (target) => {
+        if (plan.mode === 'remux') {
+            // Stream copy starts on the keyframe before the target: ask where that is
+            try {
+                target = await fetchKeyframe(path, target);
+            } catch (e) {
+                // Fall back to the raw target; the clock may be off by up to one GOP
+            }
+        }
+        offset = target;
+        const resume = !video.paused;
+        video.querySelector('source').src = fmp4Url(path, target);
+        video.load();
+        if (resume) video.play().catch(() => {});
+    };
+
+    Object.defineProperty(video, 'duration', { configurable: true, get: () => plan.duration });
+    Object.defineProperty(video, 'currentTime', {
+        configurable: true,
+        get: () => offset + clock.get.call(video),
+        set: (time) => {
+            time = Math.max(0, Math.min(time, plan.duration));
+            const local = time - offset;
+            if (local >= 0 && local <= bufferedEnd()) clock.set.call(video, local);
+            else restart(time);
+        }
+    });
+}
+
+function loadVideoSource(path, ext) {
+    const pending = document.querySelector('#media-container video');
+    if (pending) pending.dataset.path = path;
+    resolveVideoSource(path, ext).then(({ src, type, plan }) => {
+        const video = document.querySelector('#media-container video');
+        // The user may have moved on while we were probing
+        if (!video || video.dataset.path !== path) return;
+        const source = document.createElement('source');
+        source.src = src;
+        source.type = type;
+        video.appendChild(source);
+        if (plan) attachFmp4Seeking(video, path, plan);
+        video.load();
+        initPlayer();
+    });
+}
+
 export function closeModal() {
+    closeTextViewer();
     if (window.plyrInstance) {
         try { window.plyrInstance.destroy(); } catch (e) {}
         window.plyrInstance = null;
@@ -204,6 +310,7 @@ export function closeModal() {
 }
 
 export function openMedia(item) {
+    closeTextViewer();
     currentMediaItem = item;
     currentArchiveEntryName = null;
     const ext = item.name.split('.').pop().toLowerCase();
@@ -234,6 +341,9 @@ export function openMedia(item) {
                 <button onclick="window.viewerRotate()" title="Rotate">
                     <svg viewBox="0 0 24 24" width="18" height="18" stroke="currentColor" stroke-width="2" fill="none"><polyline points="23 4 23 10 17 10"></polyline><path d="M20.49 15a9 9 0 1 1-2.12-9.36L23 10"></path></svg>
                 </button>
+                ${IMAGE_EXTS.includes(ext) ? `<button onclick="window.viewerLoadOriginal()" title="Load Original">
+                    <svg viewBox="0 0 24 24" width="18" height="18" stroke="currentColor" stroke-width="2" fill="none"><polyline points="15 3 21 3 21 9"></polyline><polyline points="9 21 3 21 3 15"></polyline><line x1="21" y1="3" x2="14" y2="10"></line><line x1="3" y1="21" x2="10" y2="14"></line></svg>
+                </button>` : ''}
                 <button onclick="window.viewerReset()" title="Reset View">
                     <svg viewBox="0 0 24 24" width="18" height="18" stroke="currentColor" stroke-width="2" fill="none"><path d="M3 9l9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"></path><polyline points="9 22 9 12 15 12 15 22"></polyline></svg>
                 </button>
@@ -250,7 +360,7 @@ export function openMedia(item) {
             ${toolbarHtml}
             ${navHtml}
             <div class="viewer-image-wrapper" id="viewer-image-wrapper">
-                <img src="${viewUrl}" alt="${escapeHtml(item.name)}" id="viewer-image" data-rotation="0">
+                <img src="${previewUrl(item.path)}" data-original="${viewUrl}" alt="${escapeHtml(item.name)}" id="viewer-image" data-rotation="0">
             </div>
         `;
         modal.style.display = 'flex';
@@ -260,16 +370,11 @@ export function openMedia(item) {
         setTimeout(attachZoomPanEvents, 50);
         addRecentFile(item);
     } else if (VIDEO_EXTS.includes(ext)) {
-        let mimeType = `video/${ext}`;
-        if (ext === 'mov') mimeType = 'video/mp4';
-        if (ext === 'mkv') mimeType = 'video/webm';
-
         mediaContainer.innerHTML = `
             ${toolbarHtml}
             ${navHtml}
             <div class="viewer-video-wrapper">
                 <video controls autoplay playsinline>
-                    <source src="${viewUrl}" type="${mimeType}">
                     Your browser does not support the video tag.
                 </video>
             </div>`;
@@ -277,6 +382,8 @@ export function openMedia(item) {
         modal.style.opacity = '1';
         document.body.classList.add('modal-open');
         addRecentFile(item);
+        loadVideoSource(item.path, ext);
+        return; // Player is initialised once the source is resolved
     } else if (ext === 'pdf') {
         mediaContainer.innerHTML = `
             ${toolbarHtml}
@@ -301,32 +408,24 @@ export function openMedia(item) {
         addRecentFile(item);
     } else if (TEXT_EXTS.includes(ext)) {
         const isRenderable = ['html', 'htm', 'svg', 'md'].includes(ext);
-        const renderBtn = isRenderable ? `<button onclick="window.renderTextIframe('${viewUrl}')" class="archive-mode-btn" style="margin-left:auto; border-color:var(--c-cyan); color:var(--c-cyan);">RENDER PREVIEW</button>` : '';
+        const renderBtn = isRenderable ? `<button onclick="window.renderTextIframe('${viewUrl}')" class="archive-mode-btn" style="margin-left:0.5rem; border-color:var(--c-cyan); color:var(--c-cyan);">RENDER PREVIEW</button>` : '';
         mediaContainer.innerHTML = `
             ${toolbarHtml}
             ${navHtml}
             <div class="viewer-pdf-wrapper text-viewer-wrapper" style="background: var(--surface-low); padding:1.5rem; overflow:auto; display:flex; flex-direction:column; align-items:flex-start;">
                 <div style="display:flex; justify-content:space-between; align-items:center; margin-bottom:1rem; width:100%; flex-shrink:0;">
-                    <span style="font-family:var(--font-mono); font-size:0.8rem; color:var(--text-muted);">RAW SOURCE</span>
+                    <span style="font-family:var(--font-mono); font-size:0.8rem; color:var(--text-muted);">RAW SOURCE <span id="text-line-count"></span></span>
+                    <button onclick="window.toggleTextFollow()" class="archive-mode-btn" id="text-follow-btn" style="margin-left:auto;" title="Follow appended lines (tail -f)">FOLLOW</button>
                     ${renderBtn}
                 </div>
-                <pre style="margin:0; white-space:pre-wrap; font-family:var(--font-mono); font-size:0.85rem; color:var(--text-color); width:100%;" id="text-preview-container">Loading source...</pre>
+                <div class="text-virtual-container" id="text-preview-container">Loading source...</div>
             </div>`;
         modal.style.display = 'flex';
         modal.style.opacity = '1';
         document.body.classList.add('modal-open');
         addRecentFile(item);
 
-        fetch(viewUrl)
-            .then(res => res.text())
-            .then(text => {
-                const el = document.getElementById('text-preview-container');
-                if(el) el.textContent = text;
-            })
-            .catch(err => {
-                const el = document.getElementById('text-preview-container');
-                if(el) el.textContent = 'Failed to load text: ' + err.message;
-            });
+        openTextViewer(document.getElementById('text-preview-container'), item.path);
     }
     setTimeout(initPlayer, 50);
 }
@@ -381,6 +480,7 @@ export function navigateArchiveMedia(step) {
 }
 
 export function openRecentFile(filePath, fileName) {
+    closeTextViewer();
     currentMediaItem = null;
     currentArchiveEntryName = null;
     const ext = fileName.split('.').pop().toLowerCase();
@@ -400,6 +500,9 @@ export function openRecentFile(filePath, fileName) {
                 <button onclick="window.viewerRotate()" title="Rotate">
                     <svg viewBox="0 0 24 24" width="18" height="18" stroke="currentColor" stroke-width="2" fill="none"><polyline points="23 4 23 10 17 10"></polyline><path d="M20.49 15a9 9 0 1 1-2.12-9.36L23 10"></path></svg>
                 </button>
+                ${IMAGE_EXTS.includes(ext) ? `<button onclick="window.viewerLoadOriginal()" title="Load Original">
+                    <svg viewBox="0 0 24 24" width="18" height="18" stroke="currentColor" stroke-width="2" fill="none"><polyline points="15 3 21 3 21 9"></polyline><polyline points="9 21 3 21 3 15"></polyline><line x1="21" y1="3" x2="14" y2="10"></line><line x1="3" y1="21" x2="10" y2="14"></line></svg>
+                </button>` : ''}
                 <button onclick="window.viewerReset()" title="Reset View">
                     <svg viewBox="0 0 24 24" width="18" height="18" stroke="currentColor" stroke-width="2" fill="none"><path d="M3 9l9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"></path><polyline points="9 22 9 12 15 12 15 22"></polyline></svg>
                 </button>
@@ -415,7 +518,7 @@ export function openRecentFile(filePath, fileName) {
         mediaContainer.innerHTML = `
             ${toolbarHtml}
             <div class="viewer-image-wrapper" id="viewer-image-wrapper">
-                <img src="${viewUrl}" alt="${escapeHtml(fileName)}" id="viewer-image" data-rotation="0">
+                <img src="${previewUrl(filePath)}" data-original="${viewUrl}" alt="${escapeHtml(fileName)}" id="viewer-image" data-rotation="0">
             </div>
         `;
         modal.style.display = 'flex';
@@ -424,20 +527,17 @@ export function openRecentFile(filePath, fileName) {
         viewerReset();
         setTimeout(attachZoomPanEvents, 50);
     } else if (VIDEO_EXTS.includes(ext)) {
-        let mimeType = `video/${ext}`;
-        if (ext === 'mov') mimeType = 'video/mp4';
-        if (ext === 'mkv') mimeType = 'video/webm';
         mediaContainer.innerHTML = `
             ${toolbarHtml}
             <div class="viewer-video-wrapper">
-                <video controls autoplay playsinline>
-                    <source src="${viewUrl}" type="${mimeType}">
-                </video>
+                <video controls autoplay playsinline></video>
             </div>
         `;
         modal.style.display = 'flex';
         modal.style.opacity = '1';
         document.body.classList.add('modal-open');
+        loadVideoSource(filePath, ext);
+        return; // Player is initialised once the source is resolved
     }
     setTimeout(initPlayer, 50);
 }
@@ -517,6 +617,7 @@ export function previewArchiveEntry(archivePath, entryName) {
             </div>
         `;
     } else if (TEXT_EXTS.includes(ext)) {
+        // Archive entries aren't files on disk, so they can't use the line-indexed viewer
         const isRenderable = ['html', 'htm', 'svg', 'md'].includes(ext);
         const renderBtn = isRenderable ? `<button onclick="window.renderTextIframe('${viewUrl}')" class="archive-mode-btn" style="margin-left:auto; border-color:var(--c-cyan); color:var(--c-cyan);">RENDER PREVIEW</button>` : '';
         mediaContainer.innerHTML = `
@@ -557,6 +658,7 @@ export function playFeedVideo(container, event) {
 window.renderTextIframe = function(url) {
     const wrapper = document.querySelector('.text-viewer-wrapper');
     if (wrapper) {
+        closeTextViewer();
         wrapper.style.padding = '0';
         // Use a restrictive sandbox and an overlay to completely block interaction while allowing scrolling of the wrapper
         wrapper.innerHTML = `
@@ -566,4 +668,6 @@ window.renderTextIframe = function(url) {
             </div>
         `;
     }
-};
\ No newline at end of file
+};
+
+window.toggleTextFollow = toggleTextFollow;